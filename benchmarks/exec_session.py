@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark of ExecSession against one exec per command.
+
+Runs a small command repeatedly, on the host by default
+or inside a running container with --container.
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import statistics
+import sys
+import time
+from typing import Callable, List, Sequence
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from podman_compose_tools.executor import (
+    BinaryExecutor,
+    ExecSession,
+    ExecutorTarget,
+    HostExecutor,
+)
+from podman_compose_tools.executor.base import CommandArgs
+
+
+DEFAULT_RUNS = 200
+COMMAND = CommandArgs(["echo", "ping"])
+
+
+def latencies(run: Callable[[], None], runs: int) -> List[float]:
+    "returns the latency of each run in milliseconds"
+    results = list[float]()
+    for _ in range(runs):
+        start = time.perf_counter()
+        run()
+        results.append((time.perf_counter() - start) * 1000)
+    return results
+
+
+def capture(target: ExecutorTarget) -> Callable[[], None]:
+    def run() -> None:
+        target.exec_cmd(
+            command=COMMAND,
+            check=True,
+            capture_stdout=True,
+            work_dir=None,
+        ).close()
+
+    return run
+
+
+def report(label: str, results: Sequence[float]) -> None:
+    ordered = sorted(results)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(
+        f"{label:<12} median {statistics.median(ordered):8.3f} ms"
+        f"  p99 {p99:8.3f} ms  total {sum(ordered) / 1000:7.2f} s"
+    )
+
+
+def parse_args(args: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument(
+        "--container",
+        default=None,
+        help="Benchmark inside this running container instead of on the host",
+    )
+    parser.add_argument("--podman", default="podman", help="podman binary to use")
+    return parser.parse_args(args=args)
+
+
+def main(given_args: Sequence[str]) -> int:
+    args = parse_args(given_args)
+    target: ExecutorTarget = HostExecutor()
+    if args.container is not None:
+        target = BinaryExecutor(
+            CommandArgs(
+                [args.podman, "container", "exec", "--interactive", args.container]
+            )
+        )
+    per_command = latencies(capture(target), args.runs)
+    with ExecSession(target) as session:
+        start = time.perf_counter()
+        capture(session)()
+        setup = (time.perf_counter() - start) * 1000
+        persistent = latencies(capture(session), args.runs)
+    print(f"{args.runs} runs of {' '.join(COMMAND)!r} on {args.container or 'host'}")
+    report("exec", per_command)
+    report("session", persistent)
+    print(f"session setup incl. first command: {setup:.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
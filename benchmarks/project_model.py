@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Memory & throughput benchmark of ProjectModel for large synthetic projects.
+
+Compares the memory retained by the merged compose definition (nested dicts)
+with the memory retained by the model built from it,
+and per-volume mount lookups by full scan with the precomputed index.
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Sequence, Tuple
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from podman_compose_tools.defs.compose import ComposeDef, ComposeVersion
+from podman_compose_tools.model import ProjectModel
+
+
+DEFAULT_SERVICES = 1000
+DEFAULT_MOUNTS = 4
+
+
+def synthetic_project(services: int, mounts: int) -> ComposeDef:
+    "every service mounts its own volumes plus one shared volume, half of them in long syntax"
+    compose: Any = {
+        "_dirname": Path("/srv/project"),
+        "version": ComposeVersion("3.8"),
+        "services": {},
+        "volumes": {"shared": None},
+    }
+    for index in range(services):
+        name = f"service-{index:05}"
+        volume_defs: list[Any] = ["shared:/shared:ro"]
+        for mount in range(mounts - 1):
+            volume = f"{name}-data-{mount}"
+            compose["volumes"][volume] = {"name": f"project_{volume}"}
+            if mount % 2:
+                volume_defs.append(
+                    {"type": "volume", "source": volume, "target": f"/data/{mount}"}
+                )
+            else:
+                volume_defs.append(f"{volume}:/data/{mount}")
+        compose["services"][name] = {
+            "image": "docker.io/library/debian:stable",
+            "depends_on": [f"service-{index - 1:05}"] if index else [],
+            "volumes": volume_defs,
+        }
+    return compose
+
+
+def retained(build: Callable[[], Any]) -> Tuple[Any, int]:
+    "returns the result of build & the bytes it keeps allocated"
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def timed(func: Callable[[], Any], repeat: int) -> float:
+    "returns the best time in seconds"
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def parse_args(args: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--services", type=int, default=DEFAULT_SERVICES)
+    parser.add_argument(
+        "--mounts",
+        type=int,
+        default=DEFAULT_MOUNTS,
+        help="Mounts per service, including the shared volume",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args(args=args)
+
+
+def main(given_args: Sequence[str]) -> int:
+    args = parse_args(given_args)
+    compose, dict_bytes = retained(
+        lambda: synthetic_project(args.services, args.mounts)
+    )
+    model, model_bytes = retained(lambda: ProjectModel.from_def(compose))
+    build = timed(lambda: ProjectModel.from_def(compose), args.repeat)
+    volumes = list(model.volumes)
+
+    def scan() -> None:
+        for volume in volumes:
+            [
+                mount
+                for service in model.services.values()
+                for mount in service.mounts
+                if mount.volume == volume
+            ]
+
+    def lookup() -> None:
+        for volume in volumes:
+            model.mounts_of(volume)
+
+    print(
+        f"{len(model.services)} services, {len(model.volumes)} volumes, "
+        f"{sum(len(service.mounts) for service in model.services.values())} mounts"
+    )
+    print(f"merged dicts: {dict_bytes / 1024:8.0f} KiB")
+    print(f"model:        {model_bytes / 1024:8.0f} KiB")
+    print(
+        f"build:        {build * 1000:8.1f} ms "
+        f"({len(model.services) / build:.0f} services/s)"
+    )
+    print(f"all volumes, full scan: {timed(scan, 1) * 1000:8.1f} ms")
+    print(f"all volumes, index:     {timed(lookup, args.repeat) * 1000:8.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
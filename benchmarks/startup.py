@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for podman-compose-backup.py based on ``python -X importtime``.
+
+Runs the CLI with arguments which must not touch podman or compose files
+(``--help`` by default) and fails if the cumulative import time exceeds the budget
+or if modules only required for actual work get imported.
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, Sequence, Set, Tuple
+
+
+SCRIPT = Path(__file__).absolute().parent.parent / "podman-compose-backup.py"
+# milliseconds of import time, measured as median of all runs
+DEFAULT_BUDGET_MS = 80.0
+DEFAULT_RUNS = 7
+# must only be imported when compose files are loaded or backups are handled
+FORBIDDEN_MODULES = (
+    "asyncio",
+    "attrs",
+    "podman_compose",
+    "podman_compose_tools.backup",
+    "podman_compose_tools.compose_backup",
+    "podman_compose_tools.executor",
+    "podman_compose_tools.model",
+    "sqlite3",
+    "yaml",
+)
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_times(args: Sequence[str]) -> Tuple[Dict[str, int], Set[str], float]:
+    "returns top level imports with cumulative µs, all imported modules & the wall time in seconds"
+    start = time.perf_counter()
+    completed = subprocess.run(
+        args=[sys.executable, "-X", "importtime", str(SCRIPT), *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        sys.stderr.write(completed.stderr)
+        raise SystemExit(f"CLI failed with exit code {completed.returncode}")
+    modules = dict[str, int]()
+    imported = set[str]()
+    for line in completed.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match is None:
+            continue
+        _, cumulative, indent, name = match.groups()
+        imported.add(name)
+        # nested imports are already part of their importer's cumulative time
+        if len(indent) == 1:
+            modules[name] = int(cumulative)
+    return modules, imported, wall
+
+
+def parse_args(args: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=DEFAULT_BUDGET_MS,
+        help="Maximum median import time in milliseconds",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        help="Show the slowest top level imports",
+    )
+    parser.add_argument(
+        "--allow",
+        action="append",
+        default=[],
+        metavar="MODULE",
+        help="Allow importing one of the otherwise forbidden modules, e.g. for catalog commands",
+    )
+    parser.add_argument(
+        "cli_args",
+        nargs="*",
+        default=["--help"],
+        help="Arguments passed to the CLI (--help by default)",
+    )
+    return parser.parse_args(args=args)
+
+
+def main(given_args: Sequence[str]) -> int:
+    args = parse_args(given_args)
+    totals = list[float]()
+    walls = list[float]()
+    modules = dict[str, int]()
+    imported = set[str]()
+    for _ in range(args.runs):
+        modules, imported, wall = import_times(args.cli_args)
+        totals.append(sum(modules.values()) / 1000)
+        walls.append(wall * 1000)
+    total = statistics.median(totals)
+    print(f"import time: {total:.1f} ms (budget {args.budget:.1f} ms)")
+    print(f"wall time:   {statistics.median(walls):.1f} ms")
+    for name, micros in sorted(modules.items(), key=lambda item: -item[1])[: args.top]:
+        print(f"  {micros / 1000:7.1f} ms  {name}")
+    failures = list[str]()
+    forbidden = sorted(
+        name
+        for name in imported
+        if any(
+            name == module or name.startswith(f"{module}.")
+            for module in FORBIDDEN_MODULES
+            if module not in args.allow
+        )
+    )
+    if forbidden:
+        failures.append(f"imported eagerly: {', '.join(forbidden)}")
+    if total > args.budget:
+        failures.append(f"import time exceeds budget by {total - args.budget:.1f} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Runs a backup & restore through the mysql profile on the host,
+with stand-in mysql / mysqldump scripts instead of a database server.
+
+Covers the default client commands as well as overridden ones,
+which reach the profile already parsed, as from the profile-*-cmd labels.
+Each dump is also copied into a second directory, like with backup --copy-to.
+Before restoring, the stand-in server refuses the first connections,
+like a container which was just started.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+import sys
+import tempfile
+from typing import Dict, Optional, Sequence
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from attrs import evolve
+
+from podman_compose_tools.backup import DirectoryCopy
+from podman_compose_tools.backup.profiles import (
+    MySQLProfile,
+    ProfileContext,
+    create_profile,
+)
+from podman_compose_tools.defs.compose import PublicVolumeName
+from podman_compose_tools.executor import HostExecutor, ShellCommand
+
+
+DATABASES = ["shop", "wiki"]
+# connections refused by the stand-in server before restoring
+REFUSED_CONNECTIONS = 3
+
+CLIENT_SCRIPT = """#!/bin/sh
+if [ -f "$CHECK_REFUSED" ]; then
+    refused=$(cat "$CHECK_REFUSED")
+    if [ "$refused" -lt "$CHECK_REFUSE" ]; then
+        echo $((refused + 1)) > "$CHECK_REFUSED"
+        echo "ERROR 2002 (HY000): Can't connect to local server (stand-in)" >&2
+        exit 1
+    fi
+fi
+for arg; do
+    case "$arg" in
+        --execute=*) printf 'information_schema\\n%s\\n' "$CHECK_DATABASES"; exit 0;;
+    esac
+done
+echo "-- client $*" >> "$CHECK_RESTORED"
+cat >> "$CHECK_RESTORED"
+"""
+
+DUMP_SCRIPT = """#!/bin/sh
+for database; do :; done
+echo "CREATE DATABASE \\`$database\\`; USE \\`$database\\`; -- dump $*"
+"""
+
+
+def write_script(path: Path, content: str) -> None:
+    path.write_text(content)
+    path.chmod(0o755)
+
+
+def run_profile(
+    work_dir: Path,
+    *,
+    client_cmd: Optional[ShellCommand],
+    dump_cmd: Optional[ShellCommand],
+    compress: bool,
+) -> None:
+    backup_dir = work_dir / "backup"
+    backup_dir.mkdir()
+    copy_dir = work_dir / "copy"
+    restored = work_dir / "restored.sql"
+    refused = work_dir / "refused"
+    os.environ["CHECK_RESTORED"] = str(restored)
+    os.environ["CHECK_REFUSED"] = str(refused)
+    profile = create_profile("mysql", client_cmd=client_cmd, dump_cmd=dump_cmd)
+    assert isinstance(profile, MySQLProfile)
+    profile = evolve(profile, ready_interval=0.1)
+    context = ProfileContext(
+        volume=PublicVolumeName("check_dbdata"),
+        executor=HostExecutor(),
+        work_dir=None,
+        backup_dir=backup_dir,
+        compress_cmd=ShellCommand.from_str("gzip") if compress else None,
+        decompress_cmd=ShellCommand.from_str("gzip -d") if compress else None,
+        copies=[DirectoryCopy(directory=copy_dir)],
+    )
+    members = profile.backup(context)
+    parts = sorted(member.part or "" for member in members)
+    if parts != DATABASES:
+        raise Exception(f"Dumped {parts}, expected {DATABASES}")
+    for member in members:
+        copy = copy_dir / member.file
+        if member.copies != [str(copy)]:
+            raise Exception(f"Copies {member.copies} recorded, expected {copy}")
+        if copy.read_bytes() != (backup_dir / member.file).read_bytes():
+            raise Exception(f"Copy {copy} differs from {member.file}")
+    # the server is "restarted" for the restore
+    refused.write_text("0")
+    profile.restore(context, members)
+    if int(refused.read_text()) != REFUSED_CONNECTIONS:
+        raise Exception("Stand-in server was not waited for")
+    text = restored.read_text()
+    for database in DATABASES:
+        if f"CREATE DATABASE `{database}`" not in text:
+            raise Exception(f"Database {database} was not restored:\n{text}")
+    # the stand-ins log their arguments, which differ between default & overridden commands
+    for name, command in (("client", client_cmd), ("dump", dump_cmd)):
+        if command is not None:
+            args = str(command).split(" ", 1)[1]
+            if f"-- {name} {args}" not in text:
+                raise Exception(f"Command {command} was not used:\n{text}")
+
+
+def parse_args(args: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    return parser.parse_args(args=args)
+
+
+def main(given_args: Sequence[str]) -> int:
+    parse_args(given_args)
+    cases: Dict[str, Dict[str, Optional[ShellCommand]]] = {
+        "default commands": dict(client_cmd=None, dump_cmd=None),
+        "overridden commands": dict(
+            client_cmd=ShellCommand.from_str("mysql --user=check"),
+            dump_cmd=ShellCommand.from_str("mysqldump --user=check"),
+        ),
+    }
+    with tempfile.TemporaryDirectory() as temp:
+        bin_dir = Path(temp) / "bin"
+        bin_dir.mkdir()
+        write_script(bin_dir / "mysql", CLIENT_SCRIPT)
+        write_script(bin_dir / "mysqldump", DUMP_SCRIPT)
+        os.environ["PATH"] = f"{bin_dir}{os.pathsep}{os.environ['PATH']}"
+        os.environ["CHECK_DATABASES"] = "\n".join(DATABASES)
+        os.environ["CHECK_REFUSE"] = str(REFUSED_CONNECTIONS)
+        for index, (label, commands) in enumerate(cases.items()):
+            for compress in (False, True):
+                work_dir = Path(temp) / f"{index}-{compress}"
+                work_dir.mkdir()
+                run_profile(work_dir, compress=compress, **commands)
+                print(f"ok: {label}{', compressed' if compress else ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
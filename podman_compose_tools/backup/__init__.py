@@ -0,0 +1,34 @@
+from .catalog import (
+    BackupCatalog,
+    CatalogEntry,
+    RetentionPolicy,
+    default_catalog_path,
+)
+from .copies import (
+    CommandCopy,
+    CopyTarget,
+    DirectoryCopy,
+    open_copies,
+)
+from .journal import (
+    RestoreJournal,
+)
+from .manifest import (
+    BackupManifest,
+    ManifestMember,
+    manifest_path_for,
+)
+from .orchestrator import (
+    RestoreOrchestrator,
+    RestoreReport,
+    RestoreTask,
+)
+from .transfer import (
+    AdaptiveDumpResult,
+    DIGEST_ALGORITHM,
+    check_processes,
+    dump_adaptive_to_file,
+    dump_to_file,
+    load_from_file,
+    verify_file,
+)
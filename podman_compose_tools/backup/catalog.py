@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+from contextlib import closing
+from datetime import date
+from functools import lru_cache
+import os
+from pathlib import Path
+import sqlite3
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from attrs import define, field
+
+from .journal import RESTORE_JOURNAL_NAME
+from .manifest import BackupManifest, manifest_path_for
+from ..stream import ChunkJournal, journal_path_for
+
+
+CATALOG_DIR_NAME = "podman-compose-tools"
+CATALOG_FILE_NAME = "catalog.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS backups (
+    id INTEGER PRIMARY KEY,
+    project TEXT NOT NULL,
+    volume TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    location TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT,
+    UNIQUE (location, volume)
+);
+CREATE INDEX IF NOT EXISTS backups_by_volume
+    ON backups (project, volume, created_at DESC);
+CREATE INDEX IF NOT EXISTS backups_by_time ON backups (created_at DESC);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    backup_id INTEGER NOT NULL REFERENCES backups (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    part TEXT,
+    size INTEGER NOT NULL,
+    digest TEXT
+);
+CREATE INDEX IF NOT EXISTS files_by_backup ON files (backup_id);
+CREATE TABLE IF NOT EXISTS chunks (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS file_chunks (
+    file_id INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    digest TEXT NOT NULL REFERENCES chunks (digest),
+    PRIMARY KEY (file_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS file_chunks_by_digest ON file_chunks (digest);
+"""
+
+
+def default_catalog_path() -> Path:
+    data_home = os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+    return Path(data_home) / CATALOG_DIR_NAME / CATALOG_FILE_NAME
+
+
+@lru_cache(maxsize=4096)
+def _iso_week(day: str) -> str:
+    year, week, _ = date.fromisoformat(day).isocalendar()
+    return f"{year}-W{week:02}"
+
+
+@define
+class CatalogEntry:
+    id: int
+    project: str
+    volume: str
+    created_at: str
+    location: str
+    "backup directory, see manifest_path_for"
+    size: int
+    digest: Optional[str]
+
+
+@define(kw_only=True)
+class RetentionPolicy:
+    """
+    Which backups of each volume to keep, all others are pruned.
+    For each period, the newest backup of the most recent N periods is kept.
+    """
+
+    keep_last: int = 0
+    keep_daily: int = 0
+    keep_weekly: int = 0
+    keep_monthly: int = 0
+
+    @property
+    def empty(self) -> bool:
+        return not (
+            self.keep_last or self.keep_daily or self.keep_weekly or self.keep_monthly
+        )
+
+    def _periods(self, created_at: str) -> List[Tuple[str, int, str]]:
+        # timestamps are stored as UTC ISO strings, so periods can be sliced out
+        day = created_at[:10]
+        return [
+            ("daily", self.keep_daily, day),
+            ("weekly", self.keep_weekly, _iso_week(day)),
+            ("monthly", self.keep_monthly, created_at[:7]),
+        ]
+
+    def select_prunable(
+        self, entries: Iterator[Tuple[int, str, str, str]]
+    ) -> List[int]:
+        """
+        entries are (id, project, volume, created_at), sorted by project & volume
+        and newest first, as returned by BackupCatalog.
+        Returns ids of entries to prune in a single pass.
+        """
+        prune = list[int]()
+        current: Optional[Tuple[str, str]] = None
+        kept = 0
+        seen: Dict[str, Set[str]] = {}
+        for id, project, volume, created_at in entries:
+            if (project, volume) != current:
+                current = (project, volume)
+                kept = 0
+                seen = {"daily": set(), "weekly": set(), "monthly": set()}
+            keep = kept < self.keep_last
+            for name, limit, period in self._periods(created_at):
+                periods = seen[name]
+                if period not in periods and len(periods) < limit:
+                    periods.add(period)
+                    keep = True
+            if keep:
+                kept += 1
+            else:
+                prune.append(id)
+        return prune
+
+
+@define
+class BackupCatalog:
+    """
+    SQLite index of backups, their files and chunk checksums,
+    so listing & pruning never has to scan backup directories.
+    """
+
+    path: Path = field(factory=default_catalog_path)
+    _db: sqlite3.Connection = field(init=False)
+
+    def __attrs_post_init__(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def register(self, manifest: BackupManifest, backup_dir: Path) -> None:
+        "adds (or replaces) all members of manifest stored in backup_dir"
+        location = str(backup_dir.absolute())
+        volumes: Dict[str, List] = {}
+        for member in manifest.members:
+            volumes.setdefault(member.volume, []).append(member)
+        with self._db:
+            self._db.execute("DELETE FROM backups WHERE location = ?", (location,))
+            for volume, members in volumes.items():
+                cursor = self._db.execute(
+                    "INSERT INTO backups (project, volume, created_at, location, size, digest)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        manifest.project,
+                        volume,
+                        manifest.created_at,
+                        location,
+                        sum(member.size for member in members),
+                        # single file backups are identified by the digest of their file
+                        next(iter(members[0].digests.values()), None)
+                        if len(members) == 1
+                        else None,
+                    ),
+                )
+                backup_id = cursor.lastrowid
+                for member in members:
+                    file_id = self._db.execute(
+                        "INSERT INTO files (backup_id, name, part, size, digest)"
+                        " VALUES (?, ?, ?, ?, ?)",
+                        (
+                            backup_id,
+                            member.file,
+                            member.part,
+                            member.size,
+                            next(iter(member.digests.values()), None),
+                        ),
+                    ).lastrowid
+                    self.__register_chunks(file_id, backup_dir / member.file)
+            self.__collect_chunks()
+
+    def __register_chunks(self, file_id: Optional[int], path: Path) -> None:
+        journal = ChunkJournal.read(path)
+        if journal is None:
+            return
+        self._db.executemany(
+            "INSERT OR IGNORE INTO chunks (digest, size) VALUES (?, ?)",
+            ((chunk.digest, chunk.size) for chunk in journal.chunks),
+        )
+        self._db.executemany(
+            "INSERT INTO file_chunks (file_id, seq, digest) VALUES (?, ?, ?)",
+            ((file_id, seq, chunk.digest) for seq, chunk in enumerate(journal.chunks)),
+        )
+
+    def __collect_chunks(self) -> None:
+        self._db.execute(
+            "DELETE FROM chunks WHERE NOT EXISTS"
+            " (SELECT 1 FROM file_chunks WHERE file_chunks.digest = chunks.digest)"
+        )
+
+    def list(
+        self,
+        *,
+        project: Optional[str] = None,
+        volume: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[CatalogEntry]:
+        "newest first"
+        query = "SELECT id, project, volume, created_at, location, size, digest FROM backups"
+        conditions = list[str]()
+        params = list[object]()
+        if project is not None:
+            conditions.append("project = ?")
+            params.append(project)
+        if volume is not None:
+            conditions.append("volume = ?")
+            params.append(volume)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created_at DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [CatalogEntry(*row) for row in self._db.execute(query, params)]
+
+    def prune(
+        self,
+        policy: RetentionPolicy,
+        *,
+        project: Optional[str] = None,
+        dry_run: bool = False,
+    ) -> List[int]:
+        """
+        Removes all backups not kept by policy from the catalog and from disk,
+        returns the ids of the pruned backups.
+        """
+        if policy.empty:
+            # TODO specialize
+            raise Exception("Refusing to prune with a policy keeping nothing")
+        query = "SELECT id, project, volume, created_at FROM backups"
+        params: Tuple[str, ...] = ()
+        if project is not None:
+            query += " WHERE project = ?"
+            params = (project,)
+        query += " ORDER BY project, volume, created_at DESC, id DESC"
+        with closing(self._db.execute(query, params)) as cursor:
+            prune_ids = policy.select_prunable(iter(cursor))
+        if dry_run or not prune_ids:
+            return prune_ids
+        with self._db:
+            self._db.execute("CREATE TEMP TABLE IF NOT EXISTS prune_ids (id INTEGER)")
+            self._db.execute("DELETE FROM prune_ids")
+            self._db.executemany(
+                "INSERT INTO prune_ids (id) VALUES (?)", ((id,) for id in prune_ids)
+            )
+            removed_files = self._db.execute(
+                "SELECT backups.location, backups.volume, files.name FROM files"
+                " JOIN backups ON backups.id = files.backup_id"
+                " WHERE files.backup_id IN (SELECT id FROM prune_ids)"
+            ).fetchall()
+            self._db.execute(
+                "DELETE FROM backups WHERE id IN (SELECT id FROM prune_ids)"
+            )
+            self.__collect_chunks()
+        self.__remove_files(removed_files)
+        return prune_ids
+
+    @staticmethod
+    def __remove_files(removed_files: List[Tuple[str, str, str]]) -> None:
+        "garbage collects files no longer referenced and updates their manifests"
+        by_location: Dict[str, Set[str]] = {}
+        for location, volume, name in removed_files:
+            path = Path(location) / name
+            path.unlink(missing_ok=True)
+            journal_path_for(path).unlink(missing_ok=True)
+            by_location.setdefault(location, set()).add(volume)
+        for location, volumes in by_location.items():
+            backup_dir = Path(location)
+            manifest_path = manifest_path_for(backup_dir)
+            try:
+                manifest = BackupManifest.read(manifest_path)
+            except FileNotFoundError:
+                continue
+            manifest.members = [
+                member for member in manifest.members if member.volume not in volumes
+            ]
+            if manifest.members:
+                manifest.write(manifest_path)
+                continue
+            manifest_path.unlink()
+            (backup_dir / RESTORE_JOURNAL_NAME).unlink(missing_ok=True)
+            try:
+                backup_dir.rmdir()
+            except OSError:
+                # keep directories containing foreign files
+                pass
+
+
+__all__ = [
+    "BackupCatalog",
+    "CatalogEntry",
+    "RetentionPolicy",
+    "default_catalog_path",
+]
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import abc
+from pathlib import Path
+import shlex
+from typing import List, Optional, Sequence
+
+from attrs import frozen
+
+from ..executor import HostExecutor, ShellCommand
+from ..stream import FileSink, ProcessSink, Sink
+from ..stream.tee import CHUNK_SIZE
+
+
+class CopyTarget(metaclass=abc.ABCMeta):
+    """
+    Second destination each backup file is written to,
+    in the same pass which stores it into the backup directory.
+    """
+
+    @abc.abstractmethod
+    def sink(self, file: str) -> Sink:
+        ...
+
+    @abc.abstractmethod
+    def location(self, file: str) -> str:
+        "where the copy of file went, recorded in the manifest"
+        ...
+
+    def copy_file(self, path: Path) -> None:
+        "copies an already stored file, e.g. the manifest"
+        sink = self.sink(path.name)
+        try:
+            _feed_file(sink, path)
+        except:
+            sink.abort()
+            raise
+        sink.close()
+
+
+def _feed_file(sink: Sink, path: Path, size: Optional[int] = None) -> None:
+    "writes the first size bytes (all by default) of path into sink"
+    with open(path, "rb") as fh:
+        while size != 0 and (
+            chunk := fh.read(CHUNK_SIZE if size is None else min(size, CHUNK_SIZE))
+        ):
+            sink.write(chunk)
+            if size is not None:
+                size -= len(chunk)
+
+
+def open_copies(
+    copies: Sequence[CopyTarget], path: Path, offset: int = 0
+) -> List[Sink]:
+    """
+    Opens a sink per copy target for the file stored at path,
+    with offset, the already stored start of a resumed file is copied first.
+    """
+    sinks = list[Sink]()
+    try:
+        for copy in copies:
+            sinks.append(copy.sink(path.name))
+            if offset:
+                _feed_file(sinks[-1], path, offset)
+    except:
+        for sink in sinks:
+            sink.abort()
+        raise
+    return sinks
+
+
+@frozen
+class DirectoryCopy(CopyTarget):
+    "copies each file into directory, e.g. a mounted network share"
+
+    directory: Path
+
+    def sink(self, file: str) -> Sink:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return FileSink(self.directory / file)
+
+    def location(self, file: str) -> str:
+        return str(self.directory / file)
+
+
+@frozen
+class CommandCopy(CopyTarget):
+    "pipes each file into a shell command on the host, e.g. an upload via ssh"
+
+    command: str
+    "{file} is replaced by the shell quoted file name"
+
+    def shell_cmd(self, file: str) -> ShellCommand:
+        return ShellCommand.from_str(
+            command=self.command.replace("{file}", shlex.quote(file))
+        )
+
+    def sink(self, file: str) -> Sink:
+        return ProcessSink.spawn(self.shell_cmd(file), executor=HostExecutor())
+
+    def location(self, file: str) -> str:
+        return str(self.shell_cmd(file))
+
+
+__all__ = [
+    "CommandCopy",
+    "CopyTarget",
+    "DirectoryCopy",
+    "open_copies",
+]
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+import threading
+from typing import Set
+
+
+RESTORE_JOURNAL_NAME = "restore.journal"
+
+
+class RestoreJournal:
+    """
+    Remembers which backup files of a backup directory were restored completely,
+    so an interrupted restore can skip them when run again.
+    """
+
+    path: Path
+    __done: Set[str]
+    __lock: threading.Lock
+
+    def __init__(self, backup_dir: Path, *, resume: bool) -> None:
+        self.path = backup_dir / RESTORE_JOURNAL_NAME
+        self.__done = set()
+        self.__lock = threading.Lock()
+        if not resume:
+            self.path.unlink(missing_ok=True)
+            return
+        try:
+            with open(self.path, "r") as fh:
+                for line in fh:
+                    try:
+                        self.__done.add(json.loads(line)["file"])
+                    except (ValueError, KeyError, TypeError):
+                        # torn last line of an interrupted restore
+                        break
+        except FileNotFoundError:
+            pass
+
+    def is_done(self, file: str) -> bool:
+        return file in self.__done
+
+    def mark_done(self, file: str) -> None:
+        with self.__lock:
+            self.__done.add(file)
+            with open(self.path, "a") as fh:
+                fh.write(json.dumps({"file": file}) + "\n")
+                fh.flush()
+                os.fsync(fh.fileno())
+
+    def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+__all__ = ["RestoreJournal"]
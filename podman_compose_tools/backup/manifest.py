@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from attrs import asdict, define, field
+
+from ..defs.compose import PublicVolumeName
+from ..stream import TeeResult
+from .copies import CopyTarget
+
+
+MANIFEST_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+
+def manifest_path_for(backup_dir: Path) -> Path:
+    return backup_dir / MANIFEST_NAME
+
+
+def now_iso() -> str:
+    return datetime.now(tz=timezone.utc).isoformat()
+
+
+@define(kw_only=True)
+class ManifestMember:
+    volume: PublicVolumeName
+    file: str
+    "name of the backup file, relative to the manifest"
+    size: int
+    digests: Dict[str, str] = field(factory=dict)
+    "hex digests of the stored (possibly compressed) data by hashlib algorithm name"
+    compress_cmd: Optional[str] = field(default=None)
+    decompress_cmd: Optional[str] = field(default=None)
+    profile: Optional[str] = field(default=None)
+    "backup profile which created this member, see backup.profiles"
+    part: Optional[str] = field(default=None)
+    "identifies one of multiple members of a volume, e.g. the database name"
+    copies: List[str] = field(factory=list)
+    "where copies of the file were written in the same pass, see backup.copies"
+
+    @classmethod
+    def from_tee_result(
+        cls,
+        *,
+        volume: PublicVolumeName,
+        file: str,
+        result: TeeResult,
+        compress_cmd: Optional[str] = None,
+        decompress_cmd: Optional[str] = None,
+        profile: Optional[str] = None,
+        part: Optional[str] = None,
+        copies: Sequence[CopyTarget] = (),
+    ) -> ManifestMember:
+        return cls(
+            volume=volume,
+            file=file,
+            size=result.size,
+            digests=dict(result.digests),
+            compress_cmd=compress_cmd,
+            decompress_cmd=decompress_cmd,
+            profile=profile,
+            part=part,
+            copies=[copy.location(file) for copy in copies],
+        )
+
+
+@define(kw_only=True)
+class BackupManifest:
+    project: str
+    created_at: str = field(factory=now_iso)
+    members: List[ManifestMember] = field(factory=list)
+    version: int = field(default=MANIFEST_VERSION)
+
+    @classmethod
+    def from_json(cls, data: Mapping[str, Any]) -> BackupManifest:
+        version = data.get("version")
+        if version != MANIFEST_VERSION:
+            # TODO specialize
+            raise Exception(f"Unsupported backup manifest version {version!r}")
+        return cls(
+            project=data["project"],
+            created_at=data["created_at"],
+            members=[ManifestMember(**member) for member in data["members"]],
+            version=version,
+        )
+
+    @classmethod
+    def read(cls, path: Path) -> BackupManifest:
+        with open(path, "r") as fh:
+            return cls.from_json(json.load(fh))
+
+    def to_json(self) -> Mapping[str, Any]:
+        return asdict(self)
+
+    def write(self, path: Path) -> None:
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with open(tmp_path, "w") as fh:
+            json.dump(self.to_json(), fh, indent=2)
+        tmp_path.replace(path)
+
+    def add(self, member: ManifestMember) -> None:
+        self.members.append(member)
+
+    def members_for(self, volume: PublicVolumeName) -> List[ManifestMember]:
+        return [member for member in self.members if member.volume == volume]
+
+
+__all__ = [
+    "BackupManifest",
+    "ManifestMember",
+    "manifest_path_for",
+]
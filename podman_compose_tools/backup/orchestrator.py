@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import math
+import time
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+)
+
+from attrs import define, field
+
+
+DEFAULT_JOBS = 4
+
+
+def _names(names: Iterable[str]) -> FrozenSet[str]:
+    return frozenset(names)
+
+
+@define(kw_only=True)
+class RestoreTask:
+    name: str
+    run: Callable[[], None]
+    depends_on: FrozenSet[str] = field(factory=frozenset, converter=_names)
+    cost: int = 0
+    "estimated effort, e.g. the size of the backup to restore"
+    is_service: bool = False
+    "service starts are never throttled"
+
+
+@define(kw_only=True)
+class RestoreReport:
+    started_at: float
+    finished: Dict[str, float] = field(factory=dict)
+    "seconds since start when each task finished"
+    failed: Dict[str, BaseException] = field(factory=dict)
+    skipped: List[str] = field(factory=list)
+    "tasks which did not run because a dependency failed"
+    time_to_first_service: Optional[float] = None
+    "seconds until the first service depending on a restore was started"
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed and not self.skipped
+
+
+@define
+class RestoreOrchestrator:
+    """
+    Runs restore tasks as soon as all their dependencies are finished.
+    At most jobs non-service tasks run in parallel, picking first the ones
+    required by the service which is cheapest to bring up,
+    so the first service becomes available as early as possible.
+    """
+
+    tasks: Sequence[RestoreTask]
+    jobs: int = field(default=DEFAULT_JOBS, kw_only=True)
+    _by_name: Dict[str, RestoreTask] = field(init=False)
+
+    def __attrs_post_init__(self) -> None:
+        if self.jobs < 1:
+            # TODO specialize
+            raise Exception(f"At least one job is required, got {self.jobs}")
+        self._by_name = {task.name: task for task in self.tasks}
+        for task in self.tasks:
+            for dep in task.depends_on:
+                if dep not in self._by_name:
+                    # TODO specialize
+                    raise Exception(f"Task {task.name!r} depends on unknown {dep!r}")
+        self.__check_cycles()
+
+    def __check_cycles(self) -> None:
+        done: Set[str] = set()
+        visiting: Set[str] = set()
+
+        def visit(name: str) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                # TODO specialize
+                raise Exception(f"Dependency cycle detected at {name!r}")
+            visiting.add(name)
+            for dep in self._by_name[name].depends_on:
+                visit(dep)
+            visiting.remove(name)
+            done.add(name)
+
+        for name in self._by_name:
+            visit(name)
+
+    def _closure(self, name: str) -> Set[str]:
+        found: Set[str] = set()
+        pending = [name]
+        while pending:
+            current = pending.pop()
+            if current in found:
+                continue
+            found.add(current)
+            pending.extend(self._by_name[current].depends_on)
+        return found
+
+    def priorities(self) -> Mapping[str, float]:
+        "lower is more urgent"
+        prio: Dict[str, float] = {name: math.inf for name in self._by_name}
+        for task in self.tasks:
+            if not task.is_service:
+                continue
+            closure = self._closure(task.name)
+            cost = sum(self._by_name[name].cost for name in closure)
+            for name in closure:
+                prio[name] = min(prio[name], cost)
+        return prio
+
+    def _restores_data(self, name: str) -> bool:
+        "whether any non-service task must finish before name"
+        return any(
+            not self._by_name[dep].is_service
+            for dep in self._closure(name)
+            if dep != name
+        )
+
+    def run(self) -> RestoreReport:
+        report = RestoreReport(started_at=time.monotonic())
+        prio = self.priorities()
+        # services without restored data are up immediately, so they do not count
+        measured = {
+            task.name
+            for task in self.tasks
+            if task.is_service and self._restores_data(task.name)
+        }
+        waiting: Dict[str, Set[str]] = {
+            task.name: set(task.depends_on) for task in self.tasks
+        }
+        dependents: Dict[str, List[str]] = {name: [] for name in self._by_name}
+        for task in self.tasks:
+            for dep in task.depends_on:
+                dependents[dep].append(task.name)
+        ready: List[str] = [name for name, deps in waiting.items() if not deps]
+        running: Dict[Future, str] = {}
+        throttled = 0
+
+        def skip(name: str) -> None:
+            if name in report.skipped:
+                return
+            report.skipped.append(name)
+            waiting.pop(name, None)
+            for dependent in dependents[name]:
+                skip(dependent)
+
+        with ThreadPoolExecutor(max_workers=self.jobs + len(self.tasks)) as pool:
+            while ready or running:
+                ready.sort(key=lambda name: (prio[name], name))
+                for name in list(ready):
+                    task = self._by_name[name]
+                    if not task.is_service:
+                        if throttled >= self.jobs:
+                            continue
+                        throttled += 1
+                    ready.remove(name)
+                    waiting.pop(name, None)
+                    running[pool.submit(task.run)] = name
+                done, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    task = self._by_name[name]
+                    if not task.is_service:
+                        throttled -= 1
+                    error = future.exception()
+                    if error is not None:
+                        report.failed[name] = error
+                        for dependent in dependents[name]:
+                            skip(dependent)
+                        continue
+                    elapsed = time.monotonic() - report.started_at
+                    report.finished[name] = elapsed
+                    if name in measured and report.time_to_first_service is None:
+                        report.time_to_first_service = elapsed
+                    for dependent in dependents[name]:
+                        deps = waiting.get(dependent)
+                        if deps is None:
+                            continue
+                        deps.discard(name)
+                        if not deps:
+                            ready.append(dependent)
+        return report
+
+
+__all__ = ["RestoreOrchestrator", "RestoreReport", "RestoreTask"]
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from typing import Dict, Optional, Type
+
+from attrs import evolve
+
+from .base import (
+    DEFAULT_PROFILE_JOBS,
+    BackupProfile,
+    ProfileContext,
+)
+from .mysql import (
+    MariaDBProfile,
+    MySQLProfile,
+)
+from ...executor import ShellCommand
+
+
+PROFILES: Dict[str, Type[MySQLProfile]] = {
+    MySQLProfile.name: MySQLProfile,
+    MariaDBProfile.name: MariaDBProfile,
+}
+
+
+def create_profile(
+    name: str,
+    *,
+    client_cmd: Optional[ShellCommand] = None,
+    dump_cmd: Optional[ShellCommand] = None,
+) -> BackupProfile:
+    profile_cls = PROFILES.get(name)
+    if profile_cls is None:
+        # TODO specialize
+        raise Exception(
+            f"Unknown backup profile {name!r}, supported are {sorted(PROFILES)}"
+        )
+    profile = profile_cls()
+    if client_cmd is not None:
+        profile = evolve(profile, client_cmd=client_cmd)
+    if dump_cmd is not None:
+        profile = evolve(profile, dump_cmd=dump_cmd)
+    return profile
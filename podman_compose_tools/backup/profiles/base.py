@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import abc
+from pathlib import Path, PurePath
+from typing import List, Optional, Sequence
+
+from attrs import define
+
+from ..copies import CopyTarget
+from ..journal import RestoreJournal
+from ..manifest import ManifestMember
+from ...defs.compose import PublicVolumeName
+from ...executor import ExecutorTarget, ShellCommand
+
+
+DEFAULT_PROFILE_JOBS = 4
+
+
+@define(kw_only=True)
+class ProfileContext:
+    "where & how a profile runs for one volume"
+
+    volume: PublicVolumeName
+    executor: ExecutorTarget
+    "target running the application, e.g. the database service"
+    work_dir: Optional[PurePath]
+    backup_dir: Path
+    compress_cmd: Optional[ShellCommand] = None
+    decompress_cmd: Optional[ShellCommand] = None
+    compress_adaptive: bool = False
+    "choose compression per dump instead of compress_cmd"
+    copies: Sequence[CopyTarget] = ()
+    "further targets each dump is written to in the same pass"
+    buffer_size: Optional[int] = None
+    "ring buffer between dump & compressor"
+    pipe_size: Optional[int] = None
+    jobs: int = DEFAULT_PROFILE_JOBS
+    journal: Optional[RestoreJournal] = None
+    "restores shall mark each member done in it"
+
+
+class BackupProfile(metaclass=abc.ABCMeta):
+    """
+    Application aware backup of a volume,
+    which may store multiple manifest members for a single volume.
+    """
+
+    name: str
+
+    @abc.abstractmethod
+    def backup(self, context: ProfileContext) -> List[ManifestMember]:
+        ...
+
+    @abc.abstractmethod
+    def restore(
+        self,
+        context: ProfileContext,
+        members: Sequence[ManifestMember],
+    ) -> None:
+        ...
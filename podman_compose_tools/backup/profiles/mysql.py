@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+import shlex
+import time
+from typing import List, Optional, Sequence
+from urllib.parse import quote
+
+from attrs import define, field
+
+from .base import BackupProfile, ProfileContext
+from ..manifest import ManifestMember
+from ..transfer import dump_adaptive_to_file, dump_to_file, load_from_file
+from ...executor import ShellCommand
+from ...executor.base import ShellCommandStr
+
+
+PASSWORD_ARG = '--password="${MARIADB_ROOT_PASSWORD:-$MYSQL_ROOT_PASSWORD}"'
+
+# databases which are generated by the server and cannot be restored
+SKIPPED_DATABASES = frozenset(
+    {
+        "information_schema",
+        "performance_schema",
+        "sys",
+    }
+)
+
+# a freshly started server needs some time until it accepts connections
+READY_TIMEOUT = 120.0
+READY_INTERVAL = 1.0
+
+# --single-transaction dumps each database from a consistent snapshot
+# without locking, so the server keeps running (only true for transactional engines like InnoDB)
+DUMP_ARGS = [
+    "--single-transaction",
+    "--quick",
+    "--routines",
+    "--events",
+    "--triggers",
+    "--databases",
+]
+
+
+def _shell_cmd(command: str | ShellCommand) -> ShellCommand:
+    if isinstance(command, ShellCommand):
+        return command
+    return ShellCommand.from_str(command=command)
+
+
+@define(kw_only=True)
+class MySQLProfile(BackupProfile):
+    """
+    Dumps every database of a running MySQL/MariaDB server as its own member,
+    in parallel and without stopping the server.
+    """
+
+    name = "mysql"
+
+    client_cmd: ShellCommand = field(
+        converter=_shell_cmd,
+        default=_shell_cmd(f"mysql --user=root {PASSWORD_ARG}"),
+    )
+    dump_cmd: ShellCommand = field(
+        converter=_shell_cmd,
+        default=_shell_cmd(f"mysqldump --user=root {PASSWORD_ARG}"),
+    )
+    ready_timeout: float = field(default=READY_TIMEOUT)
+    "seconds to wait for the server before restoring"
+    ready_interval: float = field(default=READY_INTERVAL)
+
+    def wait_ready(self, context: ProfileContext) -> None:
+        "waits until the server accepts connections, e.g. after its container was just started"
+        deadline = time.monotonic() + self.ready_timeout
+        while True:
+            completed = context.executor.exec_shell(
+                shell_cmd=ShellCommandStr(
+                    f"{self.client_cmd} --batch --skip-column-names --execute='SELECT 1'"
+                ),
+                check=False,
+                capture_stdout=True,
+                work_dir=context.work_dir,
+            )
+            completed.close()
+            if completed.returncode == 0:
+                return
+            if time.monotonic() >= deadline:
+                # TODO specialize
+                raise Exception(
+                    f"Database server for {context.volume} did not accept connections within {self.ready_timeout:.0f}s"
+                )
+            time.sleep(self.ready_interval)
+
+    def list_databases(self, context: ProfileContext) -> List[str]:
+        completed = context.executor.exec_shell(
+            shell_cmd=ShellCommandStr(
+                f"{self.client_cmd} --batch --skip-column-names --execute='SHOW DATABASES'"
+            ),
+            check=True,
+            capture_stdout=True,
+            work_dir=context.work_dir,
+        )
+        try:
+            return [
+                line
+                for line in completed.stdout_text.splitlines()
+                if line and line not in SKIPPED_DATABASES
+            ]
+        finally:
+            completed.close()
+
+    def _dump_database(self, context: ProfileContext, database: str) -> ManifestMember:
+        file_name = f"{context.volume}.{quote(database, safe='')}.sql"
+        name = f"database {database} of {context.volume}"
+        command = _shell_cmd(
+            " ".join([str(self.dump_cmd), *DUMP_ARGS, shlex.quote(database)])
+        )
+        if context.compress_adaptive:
+            adaptive = dump_adaptive_to_file(
+                name=name,
+                command=command,
+                executor=context.executor,
+                work_dir=context.work_dir,
+                path=context.backup_dir / file_name,
+                copies=context.copies,
+                buffer_size=context.buffer_size,
+                pipe_size=context.pipe_size,
+            )
+            return ManifestMember.from_tee_result(
+                volume=context.volume,
+                file=file_name,
+                result=adaptive.result,
+                compress_cmd=adaptive.compress_cmd,
+                decompress_cmd=adaptive.decompress_cmd,
+                profile=self.name,
+                part=database,
+                copies=context.copies,
+            )
+        result = dump_to_file(
+            name=name,
+            command=command,
+            executor=context.executor,
+            work_dir=context.work_dir,
+            path=context.backup_dir / file_name,
+            compress_cmd=context.compress_cmd,
+            copies=context.copies,
+            buffer_size=context.buffer_size,
+            pipe_size=context.pipe_size,
+        )
+        return ManifestMember.from_tee_result(
+            volume=context.volume,
+            file=file_name,
+            result=result,
+            compress_cmd=_optional_str(context.compress_cmd),
+            decompress_cmd=_optional_str(context.decompress_cmd),
+            profile=self.name,
+            part=database,
+            copies=context.copies,
+        )
+
+    def _load_database(self, context: ProfileContext, member: ManifestMember) -> None:
+        load_from_file(
+            name=f"database {member.part} of {context.volume}",
+            # dumps contain CREATE DATABASE & USE statements
+            command=self.client_cmd,
+            executor=context.executor,
+            work_dir=context.work_dir,
+            path=context.backup_dir / member.file,
+            decompress_cmd=(
+                None
+                if member.decompress_cmd is None
+                else _shell_cmd(member.decompress_cmd)
+            ),
+        )
+        if context.journal is not None:
+            context.journal.mark_done(member.file)
+
+    def backup(self, context: ProfileContext) -> List[ManifestMember]:
+        databases = self.list_databases(context)
+        with ThreadPoolExecutor(max_workers=context.jobs) as pool:
+            return list(
+                pool.map(
+                    lambda database: self._dump_database(context, database),
+                    databases,
+                )
+            )
+
+    def restore(
+        self,
+        context: ProfileContext,
+        members: Sequence[ManifestMember],
+    ) -> None:
+        self.wait_ready(context)
+        with ThreadPoolExecutor(max_workers=context.jobs) as pool:
+            # consume results to raise the first failure
+            list(
+                pool.map(
+                    lambda member: self._load_database(context, member),
+                    members,
+                )
+            )
+
+
+@define(kw_only=True)
+class MariaDBProfile(MySQLProfile):
+    "same as MySQLProfile, but using the binary names of newer MariaDB images"
+
+    name = "mariadb"
+
+    client_cmd: ShellCommand = field(
+        converter=_shell_cmd,
+        default=_shell_cmd(f"mariadb --user=root {PASSWORD_ARG}"),
+    )
+    dump_cmd: ShellCommand = field(
+        converter=_shell_cmd,
+        default=_shell_cmd(f"mariadb-dump --user=root {PASSWORD_ARG}"),
+    )
+
+
+def _optional_str(command: Optional[ShellCommand]) -> Optional[str]:
+    return None if command is None else str(command)
+
+
+__all__ = ["MariaDBProfile", "MySQLProfile"]
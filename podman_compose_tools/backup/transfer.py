@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+from io import BufferedReader
+from pathlib import Path, PurePath
+import subprocess
+from typing import IO, Callable, Dict, Mapping, Optional, Sequence
+
+from attrs import define, evolve
+
+from ..executor import Command, ExecutorTarget, HostExecutor, ShellCommand
+from ..stream import (
+    BufferStage,
+    BufferStats,
+    CheckpointSink,
+    ChunkJournal,
+    ChunkReader,
+    CompressionChoice,
+    DEFAULT_SAMPLE_SIZE,
+    DigestSink,
+    PrefixedReader,
+    ProcessSink,
+    Tee,
+    TeeResult,
+    VerifyingReader,
+    choose_codec,
+    prepare_resume,
+    read_sample,
+    set_pipe_size,
+    skip_verified,
+)
+from ..stream.tee import CHUNK_SIZE
+from .copies import CopyTarget, open_copies
+
+
+DIGEST_ALGORITHM = "sha256"
+# buffer feeding adaptive compressors if none is configured
+FEED_BUFFER_SIZE = 4 * CHUNK_SIZE
+
+
+def check_processes(processes: Mapping[str, subprocess.Popen]) -> None:
+    "waits for all processes, raises if any of them failed"
+    codes = {name: proc.wait() for name, proc in processes.items()}
+    for name, code in codes.items():
+        if code != 0:
+            # TODO specialize
+            raise Exception(f"{name} failed with exit code {code}")
+
+
+def _pipe_reader(stream: Optional[IO[bytes]]) -> BufferedReader:
+    "stdout of a process spawned with PIPE, which subprocess opens buffered"
+    assert isinstance(stream, BufferedReader)
+    return stream
+
+
+def _resize_pipes(size: Optional[int], *streams: Optional[IO[bytes]]) -> None:
+    if size is None:
+        return
+    for stream in streams:
+        if stream is not None:
+            set_pipe_size(stream, size)
+
+
+def _join_buffer(
+    stage: Optional[BufferStage],
+    on_buffer_stats: Optional[Callable[[BufferStats], None]],
+) -> None:
+    if stage is None:
+        return
+    stats = stage.join()
+    if on_buffer_stats is not None:
+        on_buffer_stats(stats)
+
+
+def dump_to_file(
+    *,
+    name: str,
+    command: Command,
+    executor: ExecutorTarget,
+    work_dir: Optional[PurePath],
+    path: Path,
+    compress_cmd: Optional[Command] = None,
+    resume: bool = False,
+    copies: Sequence[CopyTarget] = (),
+    buffer_size: Optional[int] = None,
+    pipe_size: Optional[int] = None,
+    on_buffer_stats: Optional[Callable[[BufferStats], None]] = None,
+) -> TeeResult:
+    """
+    Streams stdout of command, optionally compressed on the host, into path
+    while computing its digest and journaling chunk checksums next to it.
+    With resume, a partial path is continued after its last verified chunk,
+    which is only valid if command (& compress_cmd) produce deterministic output.
+    Each of copies receives the same stream, written in the same pass.
+    With buffer_size, command & compressor are decoupled by a ring buffer of that size,
+    pipe_size resizes the pipes of both (if permitted).
+    """
+    offset = prepare_resume(path) if resume else 0
+    producer = command.spawn(
+        executor=executor,
+        stdout=subprocess.PIPE,
+        work_dir=work_dir,
+    )
+    producer_stdout = _pipe_reader(producer.stdout)
+    processes: Dict[str, subprocess.Popen] = {f"backup of {name}": producer}
+    stream = producer_stdout
+    stage: Optional[BufferStage] = None
+    if compress_cmd is not None:
+        # TODO support compress_image
+        compressor = compress_cmd.spawn(
+            executor=HostExecutor(),
+            stdin=producer_stdout if buffer_size is None else subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        processes[f"compression of {name}"] = compressor
+        _resize_pipes(pipe_size, producer_stdout, compressor.stdin, compressor.stdout)
+        if buffer_size is None:
+            producer_stdout.close()
+        else:
+            assert compressor.stdin is not None
+            stage = BufferStage(
+                producer_stdout,
+                compressor.stdin,
+                capacity=buffer_size,
+                name=f"buffer of {name}",
+            ).start()
+        stream = _pipe_reader(compressor.stdout)
+    else:
+        _resize_pipes(pipe_size, producer_stdout)
+    digest = DigestSink(DIGEST_ALGORITHM)
+    try:
+        if offset:
+            journal = ChunkJournal.read(path)
+            assert journal is not None
+            skip_verified(stream, journal, offset)
+            digest.feed_file(path, offset)
+        sinks = open_copies(copies, path, offset)
+        result = Tee([CheckpointSink(path, offset=offset), digest, *sinks]).run(stream)
+    except:
+        for proc in processes.values():
+            proc.kill()
+        raise
+    finally:
+        stream.close()
+        _join_buffer(stage, on_buffer_stats)
+    check_processes(processes)
+    return evolve(result, size=result.size + offset)
+
+
+@define(kw_only=True)
+class AdaptiveDumpResult:
+    result: TeeResult
+    choice: CompressionChoice
+
+    @property
+    def compress_cmd(self) -> Optional[str]:
+        codec = self.choice.codec
+        return None if codec is None else codec.compress_cmd
+
+    @property
+    def decompress_cmd(self) -> Optional[str]:
+        codec = self.choice.codec
+        return None if codec is None else codec.decompress_cmd
+
+
+def dump_adaptive_to_file(
+    *,
+    name: str,
+    command: Command,
+    executor: ExecutorTarget,
+    work_dir: Optional[PurePath],
+    path: Path,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+    copies: Sequence[CopyTarget] = (),
+    buffer_size: Optional[int] = None,
+    pipe_size: Optional[int] = None,
+    on_buffer_stats: Optional[Callable[[BufferStats], None]] = None,
+) -> AdaptiveDumpResult:
+    """
+    Like dump_to_file, but samples the start of the stream to choose the
+    strongest compressor which keeps up with command, or none at all
+    if the data is incompressible. Not resumable as the choice may differ.
+    """
+    producer = command.spawn(
+        executor=executor,
+        stdout=subprocess.PIPE,
+        work_dir=work_dir,
+    )
+    producer_stdout = _pipe_reader(producer.stdout)
+    processes: Dict[str, subprocess.Popen] = {f"backup of {name}": producer}
+    stage: Optional[BufferStage] = None
+    stream: ChunkReader = producer_stdout
+    _resize_pipes(pipe_size, producer_stdout)
+    try:
+        sample, rate = read_sample(producer_stdout, sample_size)
+        choice = choose_codec(sample, rate)
+        if choice.codec is None:
+            stream = PrefixedReader(sample, producer_stdout)
+        else:
+            compressor = ShellCommand.from_str(command=choice.codec.compress_cmd).spawn(
+                executor=HostExecutor(),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+            assert compressor.stdin is not None
+            processes[f"compression of {name}"] = compressor
+            _resize_pipes(pipe_size, compressor.stdin, compressor.stdout)
+            stage = BufferStage(
+                PrefixedReader(sample, producer_stdout),
+                compressor.stdin,
+                capacity=buffer_size or FEED_BUFFER_SIZE,
+                name=f"buffer of {name}",
+            ).start()
+            stream = _pipe_reader(compressor.stdout)
+        sinks = open_copies(copies, path)
+        result = Tee([CheckpointSink(path), DigestSink(DIGEST_ALGORITHM), *sinks]).run(
+            stream
+        )
+    except:
+        for proc in processes.values():
+            proc.kill()
+        raise
+    finally:
+        stream.close()
+        _join_buffer(stage, on_buffer_stats)
+    check_processes(processes)
+    return AdaptiveDumpResult(result=result, choice=choice)
+
+
+def verify_file(path: Path) -> bool:
+    "checks path against its complete chunk journal"
+    journal = ChunkJournal.read(path)
+    if journal is None or not journal.complete:
+        return False
+    verified = journal.verified_chunks(path)
+    return len(verified) == len(journal.chunks) and path.stat().st_size == journal.size
+
+
+def load_from_file(
+    *,
+    name: str,
+    command: Command,
+    executor: ExecutorTarget,
+    work_dir: Optional[PurePath],
+    path: Path,
+    decompress_cmd: Optional[Command] = None,
+) -> None:
+    """
+    Streams path, optionally decompressed on the host, into stdin of command.
+    If path has a chunk journal, each chunk is verified before it is passed on.
+    """
+    journal = ChunkJournal.read(path)
+    with open(path, "rb") as fh:
+        processes: Dict[str, subprocess.Popen] = {}
+        verify = journal is not None and journal.complete
+        first_stdin = subprocess.PIPE if verify else fh
+        decompressor: Optional[subprocess.Popen] = None
+        if decompress_cmd is not None:
+            decompressor = decompress_cmd.spawn(
+                executor=HostExecutor(),
+                stdin=first_stdin,
+                stdout=subprocess.PIPE,
+            )
+            processes[f"decompression of {path.name}"] = decompressor
+        consumer = command.spawn(
+            executor=executor,
+            stdin=first_stdin if decompressor is None else decompressor.stdout,
+            work_dir=work_dir,
+        )
+        if decompressor is not None:
+            assert decompressor.stdout is not None
+            decompressor.stdout.close()
+        processes[f"restore of {name}"] = consumer
+        if verify:
+            assert journal is not None
+            first = consumer if decompressor is None else decompressor
+            try:
+                Tee([ProcessSink(first)]).run(VerifyingReader(fh, journal))
+            except:
+                for proc in processes.values():
+                    proc.kill()
+                raise
+        check_processes(processes)
+
+
+__all__ = [
+    "AdaptiveDumpResult",
+    "DIGEST_ALGORITHM",
+    "FEED_BUFFER_SIZE",
+    "check_processes",
+    "dump_adaptive_to_file",
+    "dump_to_file",
+    "load_from_file",
+    "verify_file",
+]
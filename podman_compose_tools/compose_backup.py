@@ -0,0 +1,1244 @@
+# TODO implement backup single vol
+# TODO implement restore single vol
+# TODO decide upon depends_on and volume mounts which containers must be shut down and which turned on for single volume backup (def)
+# TODO group decision for multiple/all volumes (at first, throw error if incompatible as backed up state might be inconsistent)
+# TODO store full backup (= all volumes) inside one (uncompressed) tar archive
+# TODO support env-files
+# TODO implement secrets
+# TODO throw error/hint on bind mounts (not supported for now)
+
+# TODO test with normal volume
+# TODO test with mariadb
+# TODO test with entertainment-decider (testing depends_on)
+# TODO test with small nextcloud instance
+
+# TODO append compose and referenced files into tar for easy migration
+# TODO support for restoring from easy migration tar archive
+# TODO support --podman-path / --podman-compose-path
+# TODO support --podman-args
+
+
+# === imports
+
+
+from __future__ import annotations
+
+import argparse
+from contextlib import contextmanager
+from functools import cached_property, partial, wraps
+import os
+from pathlib import Path, PurePath
+import shutil
+import subprocess
+import sys
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeAlias,
+    TypedDict,
+    cast,
+)
+
+from attrs import define, field
+from attrs.converters import optional
+
+from .defs.compose import (
+    ComposeDef,
+    ComposeVersion,
+    ProjectName,
+    ServiceName,
+    ContainerName,
+    VolumeName,
+    PublicVolumeName,
+)
+from .executor import (
+    ArgCommand,
+    BinaryExecutor,
+    CompletedExec,
+    ExecSession,
+    ExecutorTarget,
+    HostExecutor,
+    ShellCommand,
+)
+from .model import (
+    ProjectModel,
+    ServiceModel,
+    VolumeModel,
+    VolumeMount,
+)
+from .executor.base import (
+    combine_cmds,
+    CommandArgs,
+    StreamArg,
+)
+
+# .backup (& its profiles) are imported where required,
+# so commands not handling backups (e.g. clone) do not pay for loading them
+if TYPE_CHECKING:
+    from .backup import (
+        BackupCatalog,
+        CopyTarget,
+        ManifestMember,
+        RestoreJournal,
+        RestoreTask,
+    )
+    from .backup.profiles import (
+        BackupProfile,
+        ProfileContext,
+    )
+    from .stream import BufferStats
+
+
+# === custom types
+
+
+LabelDict: TypeAlias = Mapping[str, str]
+
+
+class VolumeInspectDef(TypedDict):
+    Name: PublicVolumeName
+    Driver: str
+    Mountpoint: str
+    CreatedAt: str  # ISO
+    Labels: LabelDict
+    Scope: str
+    Options: Mapping
+
+
+# === constants
+
+
+# multiple prefixes for adding more if project becomes standardized
+# first label takes precendence
+LABEL_PREFIXES = [
+    "work.banananet.podman.backup.",
+]
+
+DEFAULT_MOUNT_TARGET = "/_volume"
+DEFAULT_BACKUP_IMAGE = "docker.io/library/debian:stable"
+DEFAULT_BACKUP_CMD = "tar -cf - ."
+DEFAULT_RESTORE_CMD = "tar -xf -"
+
+
+# === helpers
+
+
+host = HostExecutor()
+
+
+@wraps(print)
+def error(*args, **kwargs):
+    ret = print(*args, file=sys.stderr, **kwargs)
+    sys.stderr.flush()
+    return ret
+
+
+def parse_bool(val: str | bool) -> bool:
+    if isinstance(val, bool):
+        return val
+    return val.lower().startswith(("t", "y", "1"))
+
+
+SIZE_SUFFIXES = {"k": 1024, "m": 1024**2, "g": 1024**3}
+
+
+def parse_size(val: str | int) -> int:
+    "bytes, optionally with a binary suffix, e.g. 256M"
+    if isinstance(val, int):
+        return val
+    val = val.strip().lower().removesuffix("b").removesuffix("i")
+    factor = SIZE_SUFFIXES.get(val[-1:], 1)
+    return int(val[:-1] if factor > 1 else val) * factor
+
+
+# === code
+
+
+# required because of mypy attrs converter restrictions
+def shell_cmd_from_str(command: str | ShellCommand) -> ShellCommand:
+    if isinstance(command, ShellCommand):
+        return command
+    return ShellCommand.from_str(command=command)
+
+
+@define(kw_only=True)
+class VolumeBackupConfig:
+    # === Backups
+    enable: bool = field(converter=parse_bool, default=True)
+    container: Optional[str] = field(default=None)
+    image: str = field(default=DEFAULT_BACKUP_IMAGE)
+    mount_target: str = field(default=DEFAULT_MOUNT_TARGET)
+    stop: bool = field(converter=parse_bool, default=False)
+    resumable: bool = field(converter=parse_bool, default=False)
+    backup_cmd: ShellCommand = field(
+        converter=shell_cmd_from_str,
+        default=shell_cmd_from_str(DEFAULT_BACKUP_CMD),
+    )
+    restore_cmd: ShellCommand = field(
+        converter=shell_cmd_from_str,
+        default=shell_cmd_from_str(DEFAULT_RESTORE_CMD),
+    )
+    # === Profiles
+    profile: Optional[str] = field(default=None)
+    profile_jobs: Optional[int] = field(converter=optional(int), default=None)
+    profile_client_cmd: Optional[ShellCommand] = field(
+        converter=optional(shell_cmd_from_str),
+        default=None,
+    )
+    profile_dump_cmd: Optional[ShellCommand] = field(
+        converter=optional(shell_cmd_from_str),
+        default=None,
+    )
+    # === Compressing
+    compress_image: Optional[str] = field(default=None)
+    compress_cmd: Optional[ShellCommand] = field(
+        converter=optional(shell_cmd_from_str),
+        default=None,
+    )
+    decompress_cmd: Optional[ShellCommand] = field(
+        converter=optional(shell_cmd_from_str),
+        default=None,
+    )
+    compress_adaptive: bool = field(converter=parse_bool, default=False)
+    # === Buffering
+    buffer_size: Optional[int] = field(converter=optional(parse_size), default=None)
+    pipe_size: Optional[int] = field(converter=optional(parse_size), default=None)
+
+    @classmethod
+    def from_labels(cls, labels: LabelDict) -> VolumeBackupConfig:
+        return cls(**parse_labels(labels=labels))
+
+    def __attrs_post_init__(self):
+        if self.compress_adaptive and self.compress_cmd is not None:
+            # TODO specialize
+            raise Exception("compress-adaptive cannot be combined with compress-cmd")
+        if self.compress_cmd is None:
+            if self.decompress_cmd is not None:
+                # TODO specialize
+                raise Exception(
+                    "compress-cmd must be specified as it cannot be retrieved from decompress-cmd"
+                )
+        elif self.decompress_cmd is None:
+            self.decompress_cmd = shell_cmd_from_str(f"{self.compress_cmd} -d")
+
+
+@define(kw_only=True)
+class PodmanClient:
+
+    exec: BinaryExecutor = field(converter=lambda a: BinaryExecutor(CommandArgs([a])))
+    compose_exec: BinaryExecutor = field(
+        converter=lambda a: BinaryExecutor(CommandArgs([a]))
+    )
+
+
+class ComposeFile(ExecutorTarget):
+
+    podman: PodmanClient
+    project_name: ProjectName
+    environ: Dict[str, str]
+    model: ProjectModel
+    compose_files: Sequence[Path]
+    exec_sessions: bool
+    "run commands in services through one persistent shell per container"
+
+    def __init__(
+        self,
+        podman: PodmanClient,
+        *compose_files: Path,
+        project_name: Optional[ProjectName] = None,
+        exec_sessions: bool = False,
+    ):
+        self.podman = podman
+        self.compose_files = compose_files
+        self.exec_sessions = exec_sessions
+        ref_dir = compose_files[0].absolute().parent
+        self.project_name = project_name or ProjectName(ref_dir.name)
+        compose: ComposeDef = {
+            "_dirname": ref_dir,
+            "version": ComposeVersion("0"),
+        }
+        self.environ = dict(os.environ)
+        # imported lazily as podman_compose alone pulls in asyncio,
+        # which dominates startup of commands not loading compose files
+        from podman_compose import normalize, rec_merge, rec_subs
+        import yaml
+
+        for path in compose_files:
+            with open(path, "r") as fh:
+                content = yaml.safe_load(fh)
+                if not isinstance(content, dict):
+                    error(f"Compose file does not contain a top level object: {path}")
+                    sys.exit(1)
+                content = normalize(content)
+                content = rec_subs(content, self.environ)
+                rec_merge(compose, content)
+        if not compose.get("version", "").startswith("3."):
+            error(
+                f"Compose file version is not supported, only support 3.X compose files"
+            )
+            sys.exit(1)
+        # the merged dicts are dropped, only the compact model is kept
+        self.model = ProjectModel.from_def(compose)
+
+    @property
+    def ref_dir(self) -> Path:
+        return self.model.ref_dir
+
+    @property
+    def version(self) -> ComposeVersion:
+        return self.model.version
+
+    @cached_property
+    def services(self) -> Mapping[ServiceName, ComposeService]:
+        return {
+            name: ComposeService(compose=self, model=model)
+            for name, model in self.model.services.items()
+        }
+
+    @cached_property
+    def volumes(self) -> Mapping[VolumeName, ComposeVolume]:
+        return {
+            name: ComposeVolume(compose=self, model=model)
+            for name, model in self.model.volumes.items()
+        }
+
+    @cached_property
+    def mounts(self) -> MountIndex:
+        "wraps the mounts of the project model, following its index per volume"
+        by_service = {
+            name: [
+                ComposeServiceVolume(service=service, mount=mount)
+                for mount in service.model.mounts
+            ]
+            for name, service in self.services.items()
+        }
+        wrapped = {
+            mount.mount: mount
+            for service_mounts in by_service.values()
+            for mount in service_mounts
+        }
+        by_volume = {
+            name: [wrapped[mount] for mount in mounts]
+            for name, mounts in self.model.mounts_by_volume.items()
+        }
+        return MountIndex(by_volume=by_volume, by_service=by_service)
+
+    @cached_property
+    def container_images(self) -> Mapping[str, str]:
+        "image IDs of the existing service containers by container name, inspected at once"
+        completed = self.podman.exec.exec_cmd(
+            command=CommandArgs(
+                [
+                    "container",
+                    "inspect",
+                    *(service.container_name for service in self.services.values()),
+                ]
+            ),
+            # missing containers fail the command, but the others are still listed
+            check=False,
+            capture_stdout=True,
+            work_dir=None,
+        )
+        images = dict[str, str]()
+        try:
+            for info in completed.iter_json():
+                images[info["Name"]] = info["Image"]
+        except ValueError:
+            # e.g. no container exists, so nothing is printed
+            pass
+        finally:
+            completed.close()
+        return images
+
+    def exec_cmd(
+        self,
+        *,
+        command: CommandArgs,
+        check: bool = True,
+        capture_stdout: bool = False,
+        work_dir: Optional[PurePath] = None,
+    ) -> CompletedExec:
+        return self.podman.compose_exec.exec_cmd(
+            command=combine_cmds(
+                [f"--project-name={self.project_name}"],
+                [f"--file={file.absolute()}" for file in self.compose_files],
+                command,
+            ),
+            check=check,
+            capture_stdout=capture_stdout,
+            work_dir=work_dir or self.ref_dir,
+        )
+
+    def close_sessions(self) -> None:
+        for service in self.services.values():
+            service.session.close()
+
+    @contextmanager
+    def stopped_services(self, services: Sequence[ComposeService]) -> Iterator[None]:
+        "stops the given services & starts them again afterwards"
+        if not services:
+            yield
+            return
+        names = sorted({service.name for service in services})
+        self.exec_cmd(command=CommandArgs(["stop", *names]))
+        try:
+            yield
+        finally:
+            self.exec_cmd(command=CommandArgs(["start", *names]))
+
+
+@define(kw_only=True)
+class ComposeService(ExecutorTarget):
+
+    compose: ComposeFile
+    model: ServiceModel
+
+    @property
+    def name(self) -> ServiceName:
+        return self.model.name
+
+    @property
+    def container_name(self) -> ContainerName:
+        return self.model.container_name or ContainerName(
+            f"{self.compose.project_name}_{self.name}_1"
+        )
+
+    @cached_property
+    def depends_on(self) -> Sequence[ComposeService]:
+        return [self.compose.services[name] for name in self.model.depends_on]
+
+    @property
+    def volume_mounts(self) -> Sequence[ComposeServiceVolume]:
+        return self.compose.mounts.by_service[self.name]
+
+    @property
+    def image_id(self) -> Optional[str]:
+        return self.compose.container_images.get(self.container_name)
+
+    @property
+    def shell_cache_key(self) -> Optional[str]:
+        # containers of the same image share the same shells
+        image_id = self.image_id
+        return None if image_id is None else f"image:{image_id}"
+
+    @cached_property
+    def session(self) -> ExecSession:
+        "only started on first use"
+        return ExecSession(self)
+
+    def exec_cmd(
+        self,
+        command: CommandArgs,
+        check: bool = True,
+        capture_stdout: bool = False,
+        work_dir: Optional[PurePath] = None,
+    ) -> CompletedExec:
+        if self.compose.exec_sessions:
+            return self.session.exec_cmd(
+                command=command,
+                check=check,
+                capture_stdout=capture_stdout,
+                work_dir=work_dir,
+            )
+        return self.compose.podman.exec.exec_cmd(
+            command=combine_cmds(
+                [
+                    "container",
+                    "exec",
+                    "--interactive=false",
+                    None if work_dir is None else f"--workdir={work_dir}",
+                    self.container_name,
+                ],
+                command,
+            ),
+            check=check,
+            capture_stdout=capture_stdout,
+            work_dir=None,
+        )
+
+    def spawn_cmd(
+        self,
+        *,
+        command: CommandArgs,
+        stdin: StreamArg = None,
+        stdout: StreamArg = None,
+        work_dir: Optional[PurePath] = None,
+    ) -> subprocess.Popen:
+        return self.compose.podman.exec.spawn_cmd(
+            command=combine_cmds(
+                [
+                    "container",
+                    "exec",
+                    f"--interactive={'false' if stdin is None else 'true'}",
+                    None if work_dir is None else f"--workdir={work_dir}",
+                    self.container_name,
+                ],
+                command,
+            ),
+            stdin=stdin,
+            stdout=stdout,
+        )
+
+
+@define(kw_only=True)
+class ComposeVolume:
+
+    compose: ComposeFile
+    model: VolumeModel
+
+    @property
+    def name(self) -> VolumeName:
+        return self.model.name
+
+    @cached_property
+    def public_name(self) -> PublicVolumeName:
+        return self.model.public_name or PublicVolumeName(
+            f"{self.compose.project_name}_{self.name}"
+        )
+
+    @property
+    def used_by(self) -> Sequence[ComposeServiceVolume]:
+        "mounts of this volume only, in service order"
+        return self.compose.mounts.by_volume[self.name]
+
+    @cached_property
+    def backup_config(self) -> VolumeBackupConfig:
+        return VolumeBackupConfig.from_labels(self.inspect()["Labels"] or {})
+
+    def command_target(self, *, read_only: bool) -> Tuple[ExecutorTarget, PurePath]:
+        "returns where backup/restore commands run and their working directory"
+        config = self.backup_config
+        if config.container is not None:
+            service = self.compose.services[ServiceName(config.container)]
+            for mount in self.used_by:
+                if mount.service is service:
+                    return service, PurePath(mount.target)
+            # TODO specialize
+            raise Exception(
+                f"Service {service.name!r} does not mount volume {self.name!r}"
+            )
+        target = PurePath(config.mount_target)
+        return (
+            VolumeImageExecutor(
+                podman=self.compose.podman,
+                image=config.image,
+                volume=self.public_name,
+                mount_target=target,
+                read_only=read_only,
+            ),
+            target,
+        )
+
+    @property
+    def stop_services(self) -> Sequence[ComposeService]:
+        "services which must be stopped while accessing this volume"
+        if not self.backup_config.stop:
+            return []
+        container = self.backup_config.container
+        return [
+            mount.service for mount in self.used_by if mount.service.name != container
+        ]
+
+    def clear(self) -> None:
+        "removes all contents of this volume"
+        VolumeImageExecutor(
+            podman=self.compose.podman,
+            image=DEFAULT_BACKUP_IMAGE,
+            volume=self.public_name,
+            mount_target=PurePath(DEFAULT_MOUNT_TARGET),
+            read_only=False,
+        ).exec_cmd(
+            command=CommandArgs(
+                ["find", DEFAULT_MOUNT_TARGET, "-mindepth", "1", "-delete"]
+            ),
+            check=True,
+            capture_stdout=False,
+            work_dir=None,
+        )
+
+    def inspect(self) -> VolumeInspectDef:
+        completed = self.compose.podman.exec.exec_cmd(
+            command=CommandArgs(
+                [
+                    "volume",
+                    "inspect",
+                    self.public_name,
+                ]
+            ),
+            check=False,
+            capture_stdout=True,
+            work_dir=None,
+        )
+        if completed.returncode != 0:
+            completed.close()
+            # TODO specialize
+            raise Exception(
+                f"Could not inspect volume {self.public_name!r}, does it exist? Create it e.g. with podman-compose up --no-start"
+            )
+        try:
+            # podman returns a list with one entry per requested volume
+            return cast(VolumeInspectDef, next(completed.iter_json()))
+        finally:
+            completed.close()
+
+
+@define(kw_only=True)
+class VolumeImageExecutor(ExecutorTarget):
+    "runs commands in a temporary container of image with a volume mounted"
+
+    podman: PodmanClient
+    image: str
+    volume: PublicVolumeName
+    mount_target: PurePath
+    read_only: bool = True
+
+    @property
+    def shell_cache_key(self) -> Optional[str]:
+        return f"image-ref:{self.image}"
+
+    def __run_args(
+        self,
+        *,
+        interactive: bool,
+        work_dir: Optional[PurePath],
+    ) -> CommandArgs:
+        mount_opts = ":ro" if self.read_only else ""
+        return CommandArgs(
+            [
+                "container",
+                "run",
+                "--rm",
+                f"--interactive={'true' if interactive else 'false'}",
+                f"--volume={self.volume}:{self.mount_target}{mount_opts}",
+                f"--workdir={work_dir or self.mount_target}",
+                self.image,
+            ]
+        )
+
+    def exec_cmd(
+        self,
+        *,
+        command: CommandArgs,
+        check: bool,
+        capture_stdout: bool,
+        work_dir: Optional[PurePath],
+    ) -> CompletedExec:
+        return self.podman.exec.exec_cmd(
+            command=combine_cmds(
+                self.__run_args(interactive=False, work_dir=work_dir),
+                command,
+            ),
+            check=check,
+            capture_stdout=capture_stdout,
+            work_dir=None,
+        )
+
+    def spawn_cmd(
+        self,
+        *,
+        command: CommandArgs,
+        stdin: StreamArg = None,
+        stdout: StreamArg = None,
+        work_dir: Optional[PurePath] = None,
+    ) -> subprocess.Popen:
+        return self.podman.exec.spawn_cmd(
+            command=combine_cmds(
+                self.__run_args(interactive=stdin is not None, work_dir=work_dir),
+                command,
+            ),
+            stdin=stdin,
+            stdout=stdout,
+        )
+
+
+@define(kw_only=True)
+class ComposeServiceVolume:
+
+    service: ComposeService
+    mount: VolumeMount
+
+    @property
+    def volume(self) -> ComposeVolume:
+        return self.service.compose.volumes[self.mount.volume]
+
+    @property
+    def target(self) -> str:
+        return self.mount.target
+
+    @property
+    def read_only(self) -> bool:
+        return self.mount.read_only
+
+
+@define(kw_only=True)
+class MountIndex:
+    "volume mounts by volume & by service, lookups are O(1)"
+
+    by_volume: Mapping[VolumeName, Sequence[ComposeServiceVolume]]
+    by_service: Mapping[ServiceName, Sequence[ComposeServiceVolume]]
+
+
+def clone_volume(source: ComposeVolume, target: ComposeVolume) -> None:
+    """
+    Pipes backup_cmd of source directly into restore_cmd of target,
+    without compression or intermediate files.
+    """
+    from .backup import check_processes
+
+    src_exec, src_dir = source.command_target(read_only=True)
+    dst_exec, dst_dir = target.command_target(read_only=False)
+    with source.compose.stopped_services(source.stop_services):
+        with target.compose.stopped_services(target.stop_services):
+            if target.backup_config.container is None:
+                target.clear()
+            producer = source.backup_config.backup_cmd.spawn(
+                executor=src_exec,
+                stdout=subprocess.PIPE,
+                work_dir=src_dir,
+            )
+            assert producer.stdout is not None
+            try:
+                consumer = target.backup_config.restore_cmd.spawn(
+                    executor=dst_exec,
+                    stdin=producer.stdout,
+                    work_dir=dst_dir,
+                )
+            except:
+                producer.kill()
+                producer.wait()
+                raise
+            # only the consumer shall hold the pipe, so it sees EOF / SIGPIPE
+            producer.stdout.close()
+            check_processes(
+                {
+                    f"restore into {target.public_name}": consumer,
+                    f"backup of {source.public_name}": producer,
+                }
+            )
+
+
+def volume_profile(volume: ComposeVolume) -> Optional[BackupProfile]:
+    from .backup.profiles import create_profile
+
+    config = volume.backup_config
+    if config.profile is None:
+        return None
+    if config.container is None:
+        # TODO specialize
+        raise Exception(
+            f"Backup profile of volume {volume.name!r} requires .container to be set"
+        )
+    return create_profile(
+        config.profile,
+        client_cmd=config.profile_client_cmd,
+        dump_cmd=config.profile_dump_cmd,
+    )
+
+
+def profile_context(
+    volume: ComposeVolume,
+    backup_dir: Path,
+    *,
+    read_only: bool,
+    copies: Sequence[CopyTarget] = (),
+) -> ProfileContext:
+    from .backup.profiles import (
+        DEFAULT_PROFILE_JOBS,
+        ProfileContext,
+    )
+
+    config = volume.backup_config
+    executor, work_dir = volume.command_target(read_only=read_only)
+    return ProfileContext(
+        volume=volume.public_name,
+        executor=executor,
+        work_dir=work_dir,
+        backup_dir=backup_dir,
+        compress_cmd=config.compress_cmd,
+        decompress_cmd=config.decompress_cmd,
+        compress_adaptive=config.compress_adaptive,
+        buffer_size=config.buffer_size,
+        pipe_size=config.pipe_size,
+        jobs=config.profile_jobs or DEFAULT_PROFILE_JOBS,
+        copies=copies,
+    )
+
+
+def backup_volume(
+    volume: ComposeVolume,
+    backup_dir: Path,
+    *,
+    resume: bool = False,
+    copies: Sequence[CopyTarget] = (),
+) -> List[ManifestMember]:
+    from .backup import (
+        ManifestMember,
+        dump_adaptive_to_file,
+        dump_to_file,
+    )
+
+    config = volume.backup_config
+    profile = volume_profile(volume)
+    if profile is not None:
+        # profiles backup running applications, so no services are stopped
+        return profile.backup(
+            profile_context(volume, backup_dir, read_only=True, copies=copies)
+        )
+    executor, work_dir = volume.command_target(read_only=True)
+    file_name = volume.public_name
+
+    def report_buffer(stats: BufferStats) -> None:
+        error(f"Buffer of {volume.public_name}: {stats.describe()}")
+
+    with volume.compose.stopped_services(volume.stop_services):
+        if config.compress_adaptive:
+            adaptive = dump_adaptive_to_file(
+                name=volume.public_name,
+                command=config.backup_cmd,
+                executor=executor,
+                work_dir=work_dir,
+                path=backup_dir / file_name,
+                copies=copies,
+                buffer_size=config.buffer_size,
+                pipe_size=config.pipe_size,
+                on_buffer_stats=report_buffer,
+            )
+            return [
+                ManifestMember.from_tee_result(
+                    volume=volume.public_name,
+                    file=file_name,
+                    result=adaptive.result,
+                    compress_cmd=adaptive.compress_cmd,
+                    decompress_cmd=adaptive.decompress_cmd,
+                    copies=copies,
+                )
+            ]
+        result = dump_to_file(
+            name=volume.public_name,
+            command=config.backup_cmd,
+            executor=executor,
+            work_dir=work_dir,
+            path=backup_dir / file_name,
+            compress_cmd=config.compress_cmd,
+            resume=resume and config.resumable,
+            copies=copies,
+            buffer_size=config.buffer_size,
+            pipe_size=config.pipe_size,
+            on_buffer_stats=report_buffer,
+        )
+    return [
+        ManifestMember.from_tee_result(
+            volume=volume.public_name,
+            file=file_name,
+            result=result,
+            compress_cmd=(
+                None if config.compress_cmd is None else str(config.compress_cmd)
+            ),
+            decompress_cmd=(
+                None if config.decompress_cmd is None else str(config.decompress_cmd)
+            ),
+            copies=copies,
+        )
+    ]
+
+
+def restore_volume(
+    volume: ComposeVolume,
+    backup_dir: Path,
+    members: Sequence[ManifestMember],
+    journal: RestoreJournal,
+) -> None:
+    from .backup import load_from_file
+
+    config = volume.backup_config
+    pending = [member for member in members if not journal.is_done(member.file)]
+    if not pending:
+        return
+    profile = volume_profile(volume)
+    if profile is not None:
+        context = profile_context(volume, backup_dir, read_only=False)
+        context.journal = journal
+        profile.restore(context, pending)
+        return
+    if len(members) != 1:
+        # TODO specialize
+        raise Exception(
+            f"Expected exactly one backup for volume {volume.public_name}, found {len(members)}"
+        )
+    member = members[0]
+    executor, work_dir = volume.command_target(read_only=False)
+    if config.container is None:
+        volume.clear()
+    load_from_file(
+        name=volume.public_name,
+        command=config.restore_cmd,
+        executor=executor,
+        work_dir=work_dir,
+        path=backup_dir / member.file,
+        decompress_cmd=(
+            None
+            if member.decompress_cmd is None
+            else shell_cmd_from_str(member.decompress_cmd)
+        ),
+    )
+    journal.mark_done(member.file)
+
+
+def start_service(service: ComposeService) -> None:
+    service.compose.exec_cmd(
+        command=CommandArgs(["up", "--detach", "--no-deps", service.name])
+    )
+
+
+def restore_tasks(
+    compose: ComposeFile,
+    backup_dir: Path,
+    members: Mapping[VolumeName, Sequence[ManifestMember]],
+    journal: RestoreJournal,
+) -> List[RestoreTask]:
+    """
+    Volumes are restored as soon as the service their restore command runs in is up,
+    services are started as soon as their volumes & dependencies are ready.
+    """
+    from .backup import RestoreTask
+
+    tasks = list[RestoreTask]()
+    # a service is only ready for its dependents after the volumes restored through it
+    restored_inside = dict[str, Set[str]]()
+    # services must wait for the restored volumes they mount
+    volume_deps = dict[str, Set[str]]()
+    for name in members:
+        volume = compose.volumes[name]
+        container = volume.backup_config.container
+        if container is not None:
+            restored_inside.setdefault(container, set()).add(f"volume:{name}")
+        for mount in volume.used_by:
+            if mount.service.name != container:
+                volume_deps.setdefault(mount.service.name, set()).add(f"volume:{name}")
+    for name, volume_members in members.items():
+        volume = compose.volumes[name]
+        container = volume.backup_config.container
+        tasks.append(
+            RestoreTask(
+                name=f"volume:{name}",
+                run=partial(
+                    restore_volume,
+                    volume=volume,
+                    backup_dir=backup_dir,
+                    members=volume_members,
+                    journal=journal,
+                ),
+                depends_on=(
+                    frozenset()
+                    if container is None
+                    else frozenset({f"service:{container}"})
+                ),
+                cost=sum(member.size for member in volume_members),
+            )
+        )
+    for service in compose.services.values():
+        tasks.append(
+            RestoreTask(
+                name=f"service:{service.name}",
+                run=partial(start_service, service),
+                depends_on=frozenset(
+                    {
+                        *volume_deps.get(service.name, ()),
+                        *(f"service:{dep.name}" for dep in service.depends_on),
+                        *(
+                            task
+                            for dep in service.depends_on
+                            for task in restored_inside.get(dep.name, ())
+                        ),
+                    }
+                ),
+                is_service=True,
+            )
+        )
+    return tasks
+
+
+def parse_volume_map(
+    source: ComposeFile,
+    target: ComposeFile,
+    volumes: Sequence[str],
+    mappings: Sequence[str],
+) -> List[Tuple[ComposeVolume, ComposeVolume]]:
+    mapping: Dict[str, str] = {}
+    for entry in mappings:
+        src, sep, dst = entry.partition("=")
+        if not sep or not src or not dst:
+            error(f"Invalid volume mapping, expected SOURCE=TARGET: {entry!r}")
+            sys.exit(1)
+        mapping[src] = dst
+    if volumes:
+        names = list(volumes)
+    elif mappings:
+        names = list(mapping.keys())
+    else:
+        names = [
+            name
+            for name, volume in source.volumes.items()
+            if volume.backup_config.enable
+        ]
+    pairs = list[Tuple[ComposeVolume, ComposeVolume]]()
+    for name in names:
+        dst_name = mapping.get(name, name)
+        src_vol = source.volumes.get(VolumeName(name))
+        dst_vol = target.volumes.get(VolumeName(dst_name))
+        if src_vol is None:
+            error(f"Volume {name!r} is not defined in project {source.project_name}")
+            sys.exit(1)
+        if dst_vol is None:
+            error(
+                f"Volume {dst_name!r} is not defined in project {target.project_name}"
+            )
+            sys.exit(1)
+        if src_vol.public_name == dst_vol.public_name:
+            error(f"Cannot clone volume {src_vol.public_name!r} onto itself")
+            sys.exit(1)
+        for vol in (src_vol, dst_vol):
+            if vol.backup_config.profile is not None:
+                # cloning copies raw volume contents, which is not consistent for running applications
+                error(
+                    f"Cannot clone volume {vol.public_name!r} using backup profile {vol.backup_config.profile!r},"
+                    " use backup & restore instead"
+                )
+                sys.exit(1)
+        pairs.append((src_vol, dst_vol))
+    return pairs
+
+
+def parse_labels(labels: LabelDict) -> LabelDict:
+    ret = dict[str, str]()
+    for key, val in labels.items():
+        for prefix in LABEL_PREFIXES:
+            if key.startswith(prefix):
+                new_key = key.removeprefix(prefix).replace("-", "_")
+                ret[new_key] = val
+                break
+    return ret
+
+
+def podman_client() -> PodmanClient:
+    "looks up binaries only when required, so --help & catalog commands skip the PATH scan"
+    podman_exec = shutil.which("podman")
+    podman_compose_exec = shutil.which("podman-compose")
+    if podman_exec is None or podman_compose_exec is None:
+        error("Could not find podman and/or podman-compose in PATH")
+        sys.exit(1)
+    return PodmanClient(exec=podman_exec, compose_exec=podman_compose_exec)
+
+
+def exec_clone(
+    podman: PodmanClient,
+    source: ComposeFile,
+    args: argparse.Namespace,
+):
+    target = source
+    if args.target_file is not None or args.target_project_name is not None:
+        target = ComposeFile(
+            podman,
+            *(args.target_file or source.compose_files),
+            project_name=args.target_project_name,
+            exec_sessions=args.exec_sessions,
+        )
+    try:
+        for src_vol, dst_vol in parse_volume_map(
+            source=source,
+            target=target,
+            volumes=args.volumes,
+            mappings=args.map,
+        ):
+            error(f"Cloning {src_vol.public_name} into {dst_vol.public_name}")
+            clone_volume(source=src_vol, target=dst_vol)
+    finally:
+        if target is not source:
+            target.close_sessions()
+
+
+def exec_backup(compose: ComposeFile, args: argparse.Namespace):
+    from .backup import (
+        BackupCatalog,
+        BackupManifest,
+        CommandCopy,
+        CopyTarget,
+        DirectoryCopy,
+        default_catalog_path,
+        manifest_path_for,
+        verify_file,
+    )
+
+    names = args.volumes or [
+        name for name, volume in compose.volumes.items() if volume.backup_config.enable
+    ]
+    backup_dir: Path = args.backup_dir
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    copies: List[CopyTarget] = [
+        *(DirectoryCopy(directory=directory) for directory in args.copy_to),
+        *(CommandCopy(command=command) for command in args.copy_cmd),
+    ]
+    manifest_path = manifest_path_for(backup_dir)
+    manifest = BackupManifest(project=compose.project_name)
+    if args.resume and manifest_path.exists():
+        manifest = BackupManifest.read(manifest_path)
+    for name in names:
+        volume = compose.volumes.get(VolumeName(name))
+        if volume is None:
+            error(f"Volume {name!r} is not defined in project {compose.project_name}")
+            sys.exit(1)
+        done = manifest.members_for(volume.public_name)
+        if done and all(verify_file(backup_dir / member.file) for member in done):
+            error(f"Skipping {volume.public_name}, already backed up")
+            continue
+        manifest.members = [member for member in manifest.members if member not in done]
+        error(f"Backing up {volume.public_name}")
+        for member in backup_volume(
+            volume=volume,
+            backup_dir=backup_dir,
+            resume=args.resume,
+            copies=copies,
+        ):
+            manifest.add(member)
+        # written after each volume, so completed volumes survive failures
+        manifest.write(manifest_path)
+    manifest.write(manifest_path)
+    for copy in copies:
+        copy.copy_file(manifest_path)
+    if not args.no_catalog:
+        catalog = BackupCatalog(args.catalog or default_catalog_path())
+        try:
+            catalog.register(manifest, backup_dir)
+        finally:
+            catalog.close()
+
+
+def exec_restore(compose: ComposeFile, args: argparse.Namespace):
+    from .backup import (
+        BackupManifest,
+        ManifestMember,
+        RestoreJournal,
+        RestoreOrchestrator,
+        manifest_path_for,
+    )
+
+    backup_dir: Path = args.backup_dir
+    manifest = BackupManifest.read(manifest_path_for(backup_dir))
+    by_public_name = {volume.public_name: volume for volume in compose.volumes.values()}
+    members = dict[VolumeName, List[ManifestMember]]()
+    for member in manifest.members:
+        volume = by_public_name.get(member.volume)
+        if volume is None:
+            error(
+                f"Skipping {member.volume}, not part of project {compose.project_name}"
+            )
+            continue
+        if args.volumes and volume.name not in args.volumes:
+            continue
+        members.setdefault(volume.name, []).append(member)
+    journal = RestoreJournal(backup_dir, resume=args.resume)
+    # creates missing volumes (e.g. of a fresh migration target) & containers,
+    # as reading the backup configuration of a volume requires it to exist
+    compose.exec_cmd(command=CommandArgs(["up", "--no-start"]))
+    compose.exec_cmd(command=CommandArgs(["stop"]))
+    report = RestoreOrchestrator(
+        restore_tasks(
+            compose=compose,
+            backup_dir=backup_dir,
+            members=members,
+            journal=journal,
+        ),
+        jobs=args.jobs,
+    ).run()
+    for name, failure in report.failed.items():
+        error(f"{name} failed: {failure}")
+    for name in report.skipped:
+        error(f"{name} skipped because of failed dependencies")
+    if report.time_to_first_service is not None:
+        error(f"First service up after {report.time_to_first_service:.1f}s")
+    if not report.ok:
+        error("Rerun with --resume to skip volumes already restored")
+        sys.exit(1)
+    journal.clear()
+
+
+def project_name_of(args: argparse.Namespace) -> ProjectName:
+    "same as ComposeFile, without loading the compose files"
+    return args.project_name or ProjectName(args.file[0].absolute().parent.name)
+
+
+def exec_list(catalog: BackupCatalog, args: argparse.Namespace):
+    entries = catalog.list(
+        project=None if args.all_projects else project_name_of(args),
+        volume=args.volume,
+        limit=args.limit,
+    )
+    for entry in entries:
+        print(
+            f"{entry.created_at}\t{entry.project}\t{entry.volume}\t{entry.size}\t{entry.location}"
+        )
+
+
+def exec_prune(catalog: BackupCatalog, args: argparse.Namespace):
+    from .backup import RetentionPolicy
+
+    policy = RetentionPolicy(
+        keep_last=args.keep_last,
+        keep_daily=args.keep_daily,
+        keep_weekly=args.keep_weekly,
+        keep_monthly=args.keep_monthly,
+    )
+    if policy.empty:
+        error("At least one --keep-* option is required")
+        sys.exit(1)
+    pruned = catalog.prune(
+        policy,
+        project=None if args.all_projects else project_name_of(args),
+        dry_run=args.dry_run,
+    )
+    error(f"{'Would prune' if args.dry_run else 'Pruned'} {len(pruned)} backups")
+
+
+def exec(args: argparse.Namespace):
+    "runs the command of already parsed arguments"
+    if args.command in ("list", "prune"):
+        from .backup import BackupCatalog, default_catalog_path
+
+        catalog = BackupCatalog(args.catalog or default_catalog_path())
+        try:
+            if args.command == "list":
+                exec_list(catalog=catalog, args=args)
+            else:
+                exec_prune(catalog=catalog, args=args)
+        finally:
+            catalog.close()
+        return
+    podman = podman_client()
+    compose = ComposeFile(
+        podman,
+        *args.file,
+        project_name=args.project_name,
+        exec_sessions=args.exec_sessions,
+    )
+    try:
+        if args.command == "backup":
+            exec_backup(compose=compose, args=args)
+        elif args.command == "restore":
+            exec_restore(compose=compose, args=args)
+        elif args.command == "clone":
+            exec_clone(podman=podman, source=compose, args=args)
+    finally:
+        compose.close_sessions()
+
+
+__all__ = [
+    "error",
+    "exec",
+]
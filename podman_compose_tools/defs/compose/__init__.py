@@ -1,6 +1,7 @@
 from .compose import (
     ComposeDef,
     ComposeVersion,
+    ProjectName,
 )
 from .service import (
     ServiceName,
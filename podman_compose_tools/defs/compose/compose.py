@@ -8,6 +8,7 @@ from .volume import VolumeName, VolumeDef
 
 
 ComposeVersion = NewType("ComposeVersion", str)
+ProjectName = NewType("ProjectName", str)
 
 
 class _ComposeDefRequired(TypedDict):
@@ -9,9 +9,18 @@ from .completed import (
 from .execution import (
     ExecutorTarget,
 )
-from expander import (
+from .expander import (
     BinaryExecutor,
 )
 from .host import (
     HostExecutor,
 )
+from .session import (
+    ExecSession,
+)
+from .spool import (
+    SpooledOutput,
+)
+from .shell_cache import (
+    ShellCache,
+)
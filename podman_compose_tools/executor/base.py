@@ -1,9 +1,12 @@
-from typing import Iterable, List, NewType, Optional
+from typing import IO, Any, Iterable, List, NewType, Optional, TypeAlias
 
 
 CommandArgs = NewType("CommandArgs", List[str])
 ShellCommandStr = NewType("ShellCommandStr", str)
 
+# same as accepted by subprocess.Popen for stdin/stdout, e.g. subprocess.PIPE or a file object
+StreamArg: TypeAlias = Optional[int | IO[Any]]
+
 
 def filter_cmds(command: Iterable[Optional[str]]) -> CommandArgs:
     return CommandArgs([arg for arg in command if arg is not None])
@@ -3,11 +3,12 @@ from __future__ import annotations
 import abc
 from pathlib import PurePath
 import shlex
+import subprocess
 from typing import Callable, Iterable, List, Optional
 
 from attrs import define
 
-from .base import CommandArgs, ShellCommandStr
+from .base import CommandArgs, ShellCommandStr, StreamArg
 from .completed import CompletedExec
 from .execution import ExecutorTarget
 
@@ -35,6 +36,17 @@ class Command(metaclass=abc.ABCMeta):
     ) -> CompletedExec:
         ...
 
+    @abc.abstractmethod
+    def spawn(
+        self,
+        *,
+        executor: ExecutorTarget,
+        stdin: StreamArg = None,
+        stdout: StreamArg = None,
+        work_dir: Optional[PurePath] = None,
+    ) -> subprocess.Popen:
+        ...
+
 
 @define
 class ArgCommand(Command):
@@ -89,6 +101,21 @@ class ArgCommand(Command):
             work_dir=work_dir,
         )
 
+    def spawn(
+        self,
+        *,
+        executor: ExecutorTarget,
+        stdin: StreamArg = None,
+        stdout: StreamArg = None,
+        work_dir: Optional[PurePath] = None,
+    ) -> subprocess.Popen:
+        return executor.spawn_cmd(
+            command=CommandArgs(self.args),
+            stdin=stdin,
+            stdout=stdout,
+            work_dir=work_dir,
+        )
+
 
 @define(order=False)
 class ShellCommand(Command):
@@ -163,3 +190,18 @@ class ShellCommand(Command):
             capture_stdout=capture_stdout,
             work_dir=work_dir,
         )
+
+    def spawn(
+        self,
+        *,
+        executor: ExecutorTarget,
+        stdin: StreamArg = None,
+        stdout: StreamArg = None,
+        work_dir: Optional[PurePath] = None,
+    ) -> subprocess.Popen:
+        return executor.spawn_shell(
+            shell_cmd=ShellCommandStr(self.command),
+            stdin=stdin,
+            stdout=stdout,
+            work_dir=work_dir,
+        )
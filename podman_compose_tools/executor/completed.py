@@ -1,13 +1,18 @@
+import io
 import json
 from subprocess import CompletedProcess
-from typing import Any, Mapping
+from typing import IO, Any, Iterator, Mapping, Optional
 
-from attrs import define
+from attrs import define, field
+
+from .spool import CHUNK_SIZE, SpooledOutput
+from ..misc.json_stream import iter_json
 
 
 @define()
 class CompletedExec:
     completed_process: CompletedProcess
+    stdout: Optional[SpooledOutput] = field(default=None, kw_only=True)
 
     @property
     def returncode(self) -> int:
@@ -16,5 +21,35 @@ class CompletedExec:
     def check_returncode(self) -> None:
         return self.completed_process.check_returncode()
 
+    def stdout_stream(self) -> IO[bytes]:
+        if self.stdout is not None:
+            return self.stdout.open()
+        stdout = self.completed_process.stdout
+        if stdout is None:
+            return io.BytesIO()
+        if isinstance(stdout, str):
+            stdout = stdout.encode()
+        return io.BytesIO(stdout)
+
+    def iter_stdout(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        if self.stdout is not None:
+            yield from self.stdout.iter_chunks(chunk_size=chunk_size)
+            return
+        stream = self.stdout_stream()
+        while chunk := stream.read(chunk_size):
+            yield chunk
+
+    @property
+    def stdout_text(self) -> str:
+        return self.stdout_stream().read().decode()
+
     def to_json(self) -> Mapping[str, Any]:
-        return json.loads(self.completed_process.stdout)
+        return json.load(self.stdout_stream())
+
+    def iter_json(self) -> Iterator[Any]:
+        "parses stdout incrementally, see misc.json_stream.iter_json"
+        return iter_json(self.iter_stdout())
+
+    def close(self) -> None:
+        if self.stdout is not None:
+            self.stdout.close()
@@ -1,10 +1,12 @@
 import abc
 from functools import cached_property
 from pathlib import PurePath
+import subprocess
 from typing import Callable, Optional
 
-from .base import CommandArgs, ShellCommandStr
+from .base import CommandArgs, ShellCommandStr, StreamArg
 from .completed import CompletedExec
+from .shell_cache import ShellCache
 
 
 # List of POSIX shells which shall be used
@@ -15,6 +17,13 @@ DETECTED_SHELLS = [
     "/bin/sh",
 ]
 
+# Shell used to probe for all DETECTED_SHELLS with a single command
+PROBE_SHELL = "/bin/sh"
+PROBE_SCRIPT = 'for shell; do if command -v "$shell"; then exit 0; fi; done; exit 1'
+
+# exit codes of a shell which cannot be executed / was not found
+SHELL_FAILURE_CODES = frozenset({126, 127})
+
 
 class ExecutorTarget(metaclass=abc.ABCMeta):
     @abc.abstractmethod
@@ -28,12 +37,47 @@ class ExecutorTarget(metaclass=abc.ABCMeta):
     ) -> CompletedExec:
         ...
 
+    def spawn_cmd(
+        self,
+        *,
+        command: CommandArgs,
+        stdin: StreamArg = None,
+        stdout: StreamArg = None,
+        work_dir: Optional[PurePath] = None,
+    ) -> subprocess.Popen:
+        """
+        Starts command without waiting for it, so its stdin/stdout can be streamed.
+        The caller is responsible to wait for the returned process.
+        """
+        # TODO specialize
+        raise Exception(f"{type(self).__name__} does not support streaming commands")
+
     @staticmethod
     def process_tester(
         exec: Callable[[CommandArgs], CompletedExec]
     ) -> Callable[[CommandArgs], bool]:
         return lambda command: exec(command).returncode == 0
 
+    @property
+    def shell_cache_key(self) -> Optional[str]:
+        """
+        Key under which the detected shell may be cached between executors & runs.
+        None disables caching for this target.
+        """
+        return None
+
+    @staticmethod
+    def _probe_shell_with(
+        exec: Callable[[CommandArgs], CompletedExec]
+    ) -> Optional[str]:
+        completed = exec(
+            CommandArgs([PROBE_SHELL, "-c", PROBE_SCRIPT, "sh", *DETECTED_SHELLS])
+        )
+        if completed.returncode != 0:
+            return None
+        found = completed.stdout_text.strip()
+        return found if found in DETECTED_SHELLS else None
+
     @staticmethod
     def _search_shell_with(tester: Callable[[CommandArgs], bool]) -> str:
         for shell in DETECTED_SHELLS:
@@ -45,8 +89,18 @@ class ExecutorTarget(metaclass=abc.ABCMeta):
             f"Could not find an acceptable shell on this host, searched for {DETECTED_SHELLS}"
         )
 
-    @cached_property
-    def found_shell(self) -> str:
+    def _detect_shell(self) -> str:
+        found = self._probe_shell_with(
+            lambda command: self.exec_cmd(
+                command=command,
+                check=False,
+                capture_stdout=True,
+                work_dir=None,
+            )
+        )
+        if found is not None:
+            return found
+        # fallback for targets without PROBE_SHELL, one round trip per shell
         return self._search_shell_with(
             self.process_tester(
                 lambda command: self.exec_cmd(
@@ -58,6 +112,37 @@ class ExecutorTarget(metaclass=abc.ABCMeta):
             )
         )
 
+    @cached_property
+    def found_shell(self) -> str:
+        cache_key = self.shell_cache_key
+        if cache_key is None:
+            return self._detect_shell()
+        cache = ShellCache()
+        shell = cache.get(cache_key)
+        if shell is None:
+            shell = self._detect_shell()
+            cache.set(cache_key, shell)
+        return shell
+
+    def _refresh_shell(self, failed_shell: str) -> bool:
+        """
+        Re-detects the shell after failed_shell could not be executed,
+        which happens if it was cached by a previous run (e.g. for an older image).
+        Returns True if another shell was found, so the command can be retried.
+        """
+        cache_key = self.shell_cache_key
+        if cache_key is None:
+            return False
+        cache = ShellCache()
+        if cache.is_current(cache_key):
+            # detected by this run, so the command itself failed
+            return False
+        cache.invalidate(cache_key)
+        shell = self._detect_shell()
+        cache.set(cache_key, shell)
+        self.found_shell = shell
+        return shell != failed_shell
+
     def convert_shell_command(self, shell_cmd: ShellCommandStr) -> CommandArgs:
         return CommandArgs([self.found_shell, "-c", str(shell_cmd)])
 
@@ -69,9 +154,35 @@ class ExecutorTarget(metaclass=abc.ABCMeta):
         capture_stdout: bool,
         work_dir: Optional[PurePath],
     ) -> CompletedExec:
-        return self.exec_cmd(
+        def run() -> CompletedExec:
+            return self.exec_cmd(
+                command=self.convert_shell_command(shell_cmd=shell_cmd),
+                check=False,
+                capture_stdout=capture_stdout,
+                work_dir=work_dir,
+            )
+
+        shell = self.found_shell
+        completed = run()
+        if completed.returncode in SHELL_FAILURE_CODES and self._refresh_shell(shell):
+            completed.close()
+            completed = run()
+        if check and completed.returncode != 0:
+            completed.close()
+            completed.check_returncode()
+        return completed
+
+    def spawn_shell(
+        self,
+        *,
+        shell_cmd: ShellCommandStr,
+        stdin: StreamArg = None,
+        stdout: StreamArg = None,
+        work_dir: Optional[PurePath] = None,
+    ) -> subprocess.Popen:
+        return self.spawn_cmd(
             command=self.convert_shell_command(shell_cmd=shell_cmd),
-            check=check,
-            capture_stdout=capture_stdout,
+            stdin=stdin,
+            stdout=stdout,
             work_dir=work_dir,
         )
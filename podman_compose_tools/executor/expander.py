@@ -1,14 +1,16 @@
 from __future__ import annotations
 
 from pathlib import PurePath
+import subprocess
 from typing import Optional
 
 from attrs import define
 
-from .base import CommandArgs
+from .base import CommandArgs, StreamArg
 from .command import ArgCommand
 from .completed import CompletedExec
 from .execution import ExecutorTarget
+from .host import HostExecutor
 
 
 @define
@@ -23,9 +25,24 @@ class BinaryExecutor(ExecutorTarget):
         capture_stdout: bool,
         work_dir: Optional[PurePath],
     ) -> CompletedExec:
-        return super().exec_cmd(
+        return HostExecutor().exec_cmd(
             command=CommandArgs(self.binary_args + command),
             check=check,
             capture_stdout=capture_stdout,
             work_dir=work_dir,
         )
+
+    def spawn_cmd(
+        self,
+        *,
+        command: CommandArgs,
+        stdin: StreamArg = None,
+        stdout: StreamArg = None,
+        work_dir: Optional[PurePath] = None,
+    ) -> subprocess.Popen:
+        return HostExecutor().spawn_cmd(
+            command=CommandArgs(self.binary_args + command),
+            stdin=stdin,
+            stdout=stdout,
+            work_dir=work_dir,
+        )
@@ -4,13 +4,22 @@ from pathlib import PurePath
 import subprocess
 from typing import Optional
 
-from .base import CommandArgs
+from .base import CommandArgs, StreamArg
 from .completed import CompletedExec
 from .execution import ExecutorTarget
+from .spool import DEFAULT_SPOOL_THRESHOLD, SpooledOutput
 from ..misc.singleton import Singleton
 
 
 class HostExecutor(ExecutorTarget, metaclass=Singleton):
+
+    # captured stdout above this size is spooled to disk
+    spool_threshold: int = DEFAULT_SPOOL_THRESHOLD
+
+    @property
+    def shell_cache_key(self) -> Optional[str]:
+        return "host"
+
     def exec_cmd(
         self,
         *,
@@ -19,12 +28,51 @@ class HostExecutor(ExecutorTarget, metaclass=Singleton):
         capture_stdout: bool,
         work_dir: Optional[PurePath] = None,
     ) -> CompletedExec:
-        return CompletedExec(
-            subprocess.run(
-                args=command,
-                check=check,
-                cwd=work_dir,
-                shell=False,
-                stdout=subprocess.PIPE if capture_stdout else None,
+        if not capture_stdout:
+            return CompletedExec(
+                subprocess.run(
+                    args=command,
+                    check=check,
+                    cwd=work_dir,
+                    shell=False,
+                )
             )
+        with subprocess.Popen(
+            args=command,
+            cwd=work_dir,
+            shell=False,
+            stdout=subprocess.PIPE,
+        ) as proc:
+            assert proc.stdout is not None
+            try:
+                stdout = SpooledOutput.capture(
+                    proc.stdout,
+                    threshold=self.spool_threshold,
+                )
+            except:
+                proc.kill()
+                raise
+            returncode = proc.wait()
+        if check and returncode != 0:
+            stdout.close()
+            raise subprocess.CalledProcessError(returncode=returncode, cmd=command)
+        return CompletedExec(
+            subprocess.CompletedProcess(args=command, returncode=returncode),
+            stdout=stdout,
+        )
+
+    def spawn_cmd(
+        self,
+        *,
+        command: CommandArgs,
+        stdin: StreamArg = None,
+        stdout: StreamArg = None,
+        work_dir: Optional[PurePath] = None,
+    ) -> subprocess.Popen:
+        return subprocess.Popen(
+            args=command,
+            cwd=work_dir,
+            shell=False,
+            stdin=stdin,
+            stdout=stdout,
         )
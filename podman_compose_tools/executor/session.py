@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+from io import BufferedReader
+from pathlib import PurePath
+import secrets
+import shlex
+import subprocess
+import sys
+import threading
+from typing import Optional
+
+from .base import CommandArgs, StreamArg
+from .completed import CompletedExec
+from .execution import PROBE_SHELL, ExecutorTarget
+from .spool import CHUNK_SIZE, DEFAULT_SPOOL_THRESHOLD, SpooledOutput
+
+
+# POSIX shell kept running for the session,
+# not found_shell of the target as detecting it may already use the session
+SESSION_SHELL = PROBE_SHELL
+
+
+class ExecSession(ExecutorTarget):
+    """
+    Runs commands through one long running shell of target,
+    saving the setup of a new exec per command.
+
+    Each request is a single line of shell code sent to the shell's stdin,
+    its response is the stdout of the command followed by an end marker
+    (a random token per session) & the exit code.
+    Commands get /dev/null as stdin, streaming commands are spawned by target directly.
+    """
+
+    target: ExecutorTarget
+    spool_threshold: int
+
+    def __init__(
+        self,
+        target: ExecutorTarget,
+        *,
+        spool_threshold: int = DEFAULT_SPOOL_THRESHOLD,
+    ) -> None:
+        self.target = target
+        self.spool_threshold = spool_threshold
+        self.__token = secrets.token_hex(16)
+        self.__marker = f"\n{self.__token} ".encode()
+        self.__process: Optional[subprocess.Popen] = None
+        self.__pending = b""
+        self.__lock = threading.Lock()
+
+    @property
+    def shell_cache_key(self) -> Optional[str]:
+        return self.target.shell_cache_key
+
+    @property
+    def found_shell(self) -> str:  # type: ignore[override]
+        return self.target.found_shell
+
+    def _refresh_shell(self, failed_shell: str) -> bool:
+        return self.target._refresh_shell(failed_shell)
+
+    @property
+    def running(self) -> bool:
+        return self.__process is not None and self.__process.poll() is None
+
+    def __start(self) -> subprocess.Popen:
+        if self.__process is None or self.__process.poll() is not None:
+            self.__process = self.target.spawn_cmd(
+                command=CommandArgs([SESSION_SHELL]),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+            self.__pending = b""
+        return self.__process
+
+    def __request(self, command: CommandArgs, work_dir: Optional[PurePath]) -> bytes:
+        run = f"exec {shlex.join(command)}"
+        if work_dir is not None:
+            run = f"cd -- {shlex.quote(str(work_dir))} && {run}"
+        # subshell, so commands cannot change the state of the session
+        return (
+            f"({run}) </dev/null; printf '\\n%s %d\\n' {self.__token} \"$?\"\n".encode()
+        )
+
+    def __read_response(
+        self, stdout: BufferedReader, output: Optional[SpooledOutput]
+    ) -> int:
+        "passes output of one command to output (or our stdout) & returns its exit code"
+        sink = sys.stdout.buffer if output is None else output
+        marker = self.__marker
+        data = self.__pending
+        while True:
+            index = data.find(marker)
+            if index >= 0 and b"\n" in data[index + len(marker) :]:
+                break
+            if index < 0 and len(data) >= len(marker):
+                # keep a tail which might be the start of the marker
+                keep = len(marker) - 1
+                sink.write(data[:-keep])
+                data = data[-keep:]
+            chunk = stdout.read1(CHUNK_SIZE)
+            if not chunk:
+                # TODO specialize
+                raise Exception(f"Exec session of {self.target!r} ended unexpectedly")
+            data += chunk
+        sink.write(data[:index])
+        code, _, self.__pending = data[index + len(marker) :].partition(b"\n")
+        if output is None:
+            sys.stdout.buffer.flush()
+        return int(code)
+
+    def exec_cmd(
+        self,
+        *,
+        command: CommandArgs,
+        check: bool,
+        capture_stdout: bool,
+        work_dir: Optional[PurePath] = None,
+    ) -> CompletedExec:
+        with self.__lock:
+            process = self.__start()
+            # subprocess opens pipes buffered
+            assert process.stdin is not None
+            assert isinstance(process.stdout, BufferedReader)
+            output = (
+                SpooledOutput(threshold=self.spool_threshold)
+                if capture_stdout
+                else None
+            )
+            try:
+                process.stdin.write(self.__request(command, work_dir))
+                process.stdin.flush()
+                returncode = self.__read_response(process.stdout, output)
+            except:
+                if output is not None:
+                    output.close()
+                # the framing may be out of sync, start over with the next command
+                self.__kill()
+                raise
+        if check and returncode != 0:
+            if output is not None:
+                output.close()
+            raise subprocess.CalledProcessError(returncode=returncode, cmd=command)
+        return CompletedExec(
+            subprocess.CompletedProcess(args=command, returncode=returncode),
+            stdout=output,
+        )
+
+    def spawn_cmd(
+        self,
+        *,
+        command: CommandArgs,
+        stdin: StreamArg = None,
+        stdout: StreamArg = None,
+        work_dir: Optional[PurePath] = None,
+    ) -> subprocess.Popen:
+        return self.target.spawn_cmd(
+            command=command,
+            stdin=stdin,
+            stdout=stdout,
+            work_dir=work_dir,
+        )
+
+    def __kill(self) -> None:
+        if self.__process is not None:
+            self.__process.kill()
+            self.__process.wait()
+            self.__process = None
+
+    def close(self) -> None:
+        "ends the shell, if it was started at all"
+        with self.__lock:
+            process = self.__process
+            if process is None:
+                return
+            self.__process = None
+            assert process.stdin is not None and process.stdout is not None
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            process.stdout.close()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+    def __enter__(self) -> ExecSession:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+__all__ = ["ExecSession", "SESSION_SHELL"]
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from ..misc.singleton import Singleton
+
+CACHE_DIR_NAME = "podman-compose-tools"
+CACHE_FILE_NAME = "shells.json"
+
+
+def default_cache_path() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / CACHE_DIR_NAME / CACHE_FILE_NAME
+
+
+class ShellCache(metaclass=Singleton):
+    """
+    Remembers which shell was detected for an executor target,
+    keyed by ExecutorTarget.shell_cache_key (e.g. the image ID of a container).
+    Entries are shared by all executors of this process and persisted between runs.
+    """
+
+    path: Path
+    __entries: Optional[Dict[str, str]]
+    __detected: Set[str]
+    "keys set by this process, which are known to be current"
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path or default_cache_path()
+        self.__entries = None
+        self.__detected = set()
+
+    @property
+    def _entries(self) -> Dict[str, str]:
+        if self.__entries is None:
+            self.__entries = self.__load()
+        return self.__entries
+
+    def __load(self) -> Dict[str, str]:
+        try:
+            with open(self.path, "r") as fh:
+                content = json.load(fh)
+        except (OSError, ValueError):
+            # missing or broken caches are just rebuilt
+            return {}
+        if not isinstance(content, dict):
+            return {}
+        return {
+            key: val
+            for key, val in content.items()
+            if isinstance(key, str) and isinstance(val, str)
+        }
+
+    def __store(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "w") as fh:
+                json.dump(self._entries, fh, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # caching is an optimization only, so failing to persist is not fatal
+            pass
+
+    def get(self, key: str) -> Optional[str]:
+        return self._entries.get(key)
+
+    def is_current(self, key: str) -> bool:
+        "whether the entry was detected by this process instead of loaded from a previous run"
+        return key in self.__detected
+
+    def set(self, key: str, shell: str) -> None:
+        self.__detected.add(key)
+        if self._entries.get(key) == shell:
+            return
+        self._entries[key] = shell
+        self.__store()
+
+    def invalidate(self, key: str) -> None:
+        if self._entries.pop(key, None) is not None:
+            self.__store()
+
+
+__all__ = ["ShellCache", "default_cache_path"]
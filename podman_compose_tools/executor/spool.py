@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from tempfile import SpooledTemporaryFile
+from typing import IO, Iterator, Optional
+
+
+# output larger than this is spooled to a temporary file instead of memory
+DEFAULT_SPOOL_THRESHOLD = 8 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+class SpooledOutput:
+    """
+    Captured output of a process,
+    kept in memory up to threshold bytes and spooled to a temporary file beyond that.
+    """
+
+    size: int
+    __file: SpooledTemporaryFile[bytes]
+
+    def __init__(self, threshold: int = DEFAULT_SPOOL_THRESHOLD) -> None:
+        self.size = 0
+        self.__file = SpooledTemporaryFile(max_size=threshold, mode="w+b")
+
+    @classmethod
+    def capture(
+        cls,
+        stream: IO[bytes],
+        threshold: int = DEFAULT_SPOOL_THRESHOLD,
+    ) -> SpooledOutput:
+        output = cls(threshold=threshold)
+        while chunk := stream.read(CHUNK_SIZE):
+            output.write(chunk)
+        return output
+
+    def write(self, chunk: bytes) -> None:
+        self.__file.write(chunk)
+        self.size += len(chunk)
+
+    def open(self) -> IO[bytes]:
+        "returns the captured output as stream, rewound to the start"
+        self.__file.seek(0)
+        return self.__file
+
+    def iter_chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        stream = self.open()
+        while chunk := stream.read(chunk_size):
+            yield chunk
+
+    def read_bytes(self, limit: Optional[int] = None) -> bytes:
+        return self.open().read(-1 if limit is None else limit)
+
+    def close(self) -> None:
+        self.__file.close()
+
+
+__all__ = ["DEFAULT_SPOOL_THRESHOLD", "SpooledOutput"]
@@ -1 +1,2 @@
+from .json_stream import iter_json
 from .singleton import Singleton
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import codecs
+import json
+import re
+from typing import Any, Iterable, Iterator, Optional
+
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+# characters which change the nesting of a string / array / object
+_STRUCTURE = re.compile(r'["\\\[\]{}]')
+# characters which terminate a number or literal
+_SCALAR_END = re.compile(r"[ \t\n\r,\]}]")
+
+
+class _ValueEnd:
+    """
+    Finds where a JSON value ends without parsing it, fed chunk by chunk,
+    so the value is decoded once it is complete instead of on every chunk.
+    """
+
+    def __init__(self) -> None:
+        self.started = False
+        self.scalar = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped_at: Optional[int] = None
+        "index of the escaped character in the current chunk"
+
+    def feed(self, text: str, start: int = 0) -> Optional[int]:
+        "returns the index behind the value if it ends in text"
+        if not self.started:
+            self.started = True
+            first = text[start]
+            if first == '"':
+                self.in_string = True
+                start += 1
+            elif first in "[{":
+                self.depth = 1
+                start += 1
+            else:
+                self.scalar = True
+        if self.scalar:
+            match = _SCALAR_END.search(text, start)
+            return None if match is None else match.start()
+        escaped_at, self.escaped_at = self.escaped_at, None
+        for match in _STRUCTURE.finditer(text, start):
+            index = match.start()
+            if index == escaped_at:
+                continue
+            char = match.group()
+            if self.in_string:
+                if char == "\\":
+                    escaped_at = index + 1
+                elif char == '"':
+                    self.in_string = False
+                    if self.depth == 0:
+                        return index + 1
+            elif char == '"':
+                self.in_string = True
+            elif char in "[{":
+                self.depth += 1
+            elif char in "]}":
+                self.depth -= 1
+                if self.depth == 0:
+                    return index + 1
+        if escaped_at == len(text):
+            # escape sequence continues in the next chunk
+            self.escaped_at = 0
+        return None
+
+
+class _Buffer:
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def next_text(self) -> Optional[str]:
+        "decodes the next chunk, returns None if no data is left"
+        if self.eof:
+            return None
+        for chunk in self._chunks:
+            decoded = self._decoder.decode(chunk)
+            if decoded:
+                return decoded
+        self.eof = True
+        return self._decoder.decode(b"", final=True) or None
+
+    def skip_whitespace(self) -> bool:
+        "skips whitespace, returns False if end of stream was reached"
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return True
+            # buffer fully consumed, so only the next chunk is kept
+            text = self.next_text()
+            if text is None:
+                return False
+            self.text = text
+            self.pos = 0
+
+    def peek(self) -> str:
+        return self.text[self.pos]
+
+    def decode_value(self) -> Any:
+        "decodes the value starting at pos, which must not be whitespace"
+        scanner = _ValueEnd()
+        if scanner.feed(self.text, self.pos) is None:
+            # collect chunks until the value is complete, joining them only once,
+            # which keeps the buffer bounded by the size of one value plus one chunk
+            parts = [self.text[self.pos :]]
+            while (text := self.next_text()) is not None:
+                parts.append(text)
+                if scanner.feed(text) is not None:
+                    break
+            self.text = "".join(parts)
+            self.pos = 0
+        value, self.pos = _decoder.raw_decode(self.text, self.pos)
+        return value
+
+
+def iter_json(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """
+    Parses JSON incrementally from a stream of byte chunks.
+    A top level array is yielded element by element,
+    otherwise all concatenated top level values (e.g. JSON lines) are yielded.
+    Only one element is kept in memory at a time.
+    """
+    buf = _Buffer(chunks)
+    if not buf.skip_whitespace():
+        return
+    if buf.peek() != "[":
+        while buf.skip_whitespace():
+            yield buf.decode_value()
+        return
+    buf.pos += 1
+    if buf.skip_whitespace() and buf.peek() == "]":
+        buf.pos += 1
+        return
+    while True:
+        if not buf.skip_whitespace():
+            raise json.JSONDecodeError("Unterminated array", buf.text, buf.pos)
+        yield buf.decode_value()
+        if not buf.skip_whitespace():
+            raise json.JSONDecodeError("Unterminated array", buf.text, buf.pos)
+        sep = buf.peek()
+        buf.pos += 1
+        if sep == "]":
+            return
+        if sep != ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", buf.text, buf.pos - 1)
+
+
+__all__ = ["iter_json"]
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
+import abc
 from typing import Any, Type, TypeVar
 
 
 T = TypeVar("T", bound="Singleton")
 
 
-class Singleton(type):
+# derives from ABCMeta so abstract base classes may be singletons as well
+class Singleton(abc.ABCMeta):
     _instances = dict[Type, Any]()
 
     def __call__(cls: T, *args, **kwargs) -> T:
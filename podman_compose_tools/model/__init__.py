@@ -0,0 +1,6 @@
+from .project import (
+    ProjectModel,
+    ServiceModel,
+    VolumeModel,
+    VolumeMount,
+)
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from attrs import frozen
+
+from ..defs.compose import (
+    ComposeDef,
+    ComposeServiceDef,
+    ComposeServiceVolumeDef,
+    ComposeVersion,
+    ComposeVolumeDef,
+    ContainerName,
+    PublicVolumeName,
+    ServiceName,
+    VolumeName,
+)
+
+
+@frozen(kw_only=True)
+class VolumeMount:
+    "a named volume mounted into a service"
+
+    service: ServiceName
+    volume: VolumeName
+    target: str
+    read_only: bool
+
+    @classmethod
+    def parse(
+        cls,
+        *,
+        service: ServiceName,
+        volume_def: ComposeServiceVolumeDef,
+    ) -> VolumeMount:
+        if isinstance(volume_def, str):
+            values = volume_def.split(sep=":", maxsplit=2)
+            if len(values) == 1:
+                # implicit volume
+                # TODO specialize
+                raise Exception(f"Do not support implicit volumes: {volume_def!r}")
+            if len(values) == 2:
+                src, target = values
+                mode = "rw"  # default
+            else:
+                src, target, mode = values
+            if mode not in {"ro", "rw"}:
+                # TODO specialize
+                raise Exception(f"Unsupported mode {mode!r} for volume {volume_def!r}")
+            if "/" in src:
+                # volume type: bind
+                # TODO specialize
+                raise Exception(
+                    f"Unsupported volume type 'bind' for volume {volume_def!r}"
+                )
+            # volume type: volume
+            return cls(
+                service=service,
+                volume=VolumeName(sys.intern(src)),
+                target=sys.intern(target),
+                read_only=mode == "ro",
+            )
+        if volume_def["type"] != "volume":
+            # TODO specialize
+            raise Exception(
+                f"Unsupported volume type {volume_def['type']!r} for volume"
+            )
+        return cls(
+            service=service,
+            volume=VolumeName(sys.intern(volume_def["source"])),
+            target=sys.intern(volume_def["target"]),
+            read_only=volume_def.get("read_only", False),
+        )
+
+
+@frozen(kw_only=True)
+class ServiceModel:
+    name: ServiceName
+    container_name: Optional[ContainerName]
+    "None if not set explicitly"
+    depends_on: Tuple[ServiceName, ...]
+    mounts: Tuple[VolumeMount, ...]
+
+    @classmethod
+    def from_def(cls, name: ServiceName, base: ComposeServiceDef) -> ServiceModel:
+        name = ServiceName(sys.intern(name))
+        container_name = base.get("container_name")
+        return cls(
+            name=name,
+            container_name=container_name,
+            depends_on=tuple(
+                ServiceName(sys.intern(dep)) for dep in base.get("depends_on", [])
+            ),
+            mounts=tuple(
+                VolumeMount.parse(service=name, volume_def=volume_def)
+                for volume_def in base.get("volumes", [])
+            ),
+        )
+
+
+@frozen(kw_only=True)
+class VolumeModel:
+    name: VolumeName
+    public_name: Optional[PublicVolumeName]
+    "None if not set explicitly"
+
+    @classmethod
+    def from_def(cls, name: VolumeName, base: ComposeVolumeDef) -> VolumeModel:
+        return cls(
+            name=VolumeName(sys.intern(name)),
+            public_name=base.get("name"),
+        )
+
+
+@frozen(kw_only=True)
+class ProjectModel:
+    """
+    Immutable, validated view of a merged compose definition,
+    built once so nothing has to be re-parsed or searched later on.
+    """
+
+    ref_dir: Path
+    version: ComposeVersion
+    services: Mapping[ServiceName, ServiceModel]
+    volumes: Mapping[VolumeName, VolumeModel]
+    mounts_by_volume: Mapping[VolumeName, Tuple[VolumeMount, ...]]
+    "index of all mounts per volume, in service order"
+
+    @classmethod
+    def from_def(cls, compose: ComposeDef) -> ProjectModel:
+        volumes = {
+            volume.name: volume
+            for volume in (
+                VolumeModel.from_def(name, base or {})
+                for name, base in compose.get("volumes", {}).items()
+            )
+        }
+        services = dict[ServiceName, ServiceModel]()
+        mounts_by_volume: Dict[VolumeName, List[VolumeMount]] = {
+            name: [] for name in volumes
+        }
+        for name, base in compose.get("services", {}).items():
+            service = ServiceModel.from_def(name, base or {})
+            for mount in service.mounts:
+                users = mounts_by_volume.get(mount.volume)
+                if users is None:
+                    # TODO specialize
+                    raise Exception(
+                        f"Service {service.name!r} mounts undefined volume {mount.volume!r}"
+                    )
+                users.append(mount)
+            services[service.name] = service
+        for service in services.values():
+            for dep in service.depends_on:
+                if dep not in services:
+                    # TODO specialize
+                    raise Exception(
+                        f"Service {service.name!r} depends on undefined service {dep!r}"
+                    )
+        return cls(
+            ref_dir=compose["_dirname"],
+            version=compose.get("version", ComposeVersion("")),
+            services=MappingProxyType(services),
+            volumes=MappingProxyType(volumes),
+            mounts_by_volume=MappingProxyType(
+                {name: tuple(mounts) for name, mounts in mounts_by_volume.items()}
+            ),
+        )
+
+    def mounts_of(self, volume: VolumeName) -> Tuple[VolumeMount, ...]:
+        return self.mounts_by_volume.get(volume, ())
+
+
+__all__ = [
+    "ProjectModel",
+    "ServiceModel",
+    "VolumeModel",
+    "VolumeMount",
+]
@@ -0,0 +1,40 @@
+from .base import (
+    ChunkReader,
+    Reader,
+)
+from .checkpoint import (
+    CheckpointSink,
+    ChunkJournal,
+    ChunkRecord,
+    VerifyingReader,
+    journal_path_for,
+    prepare_resume,
+    skip_verified,
+)
+from .compress import (
+    CODEC_FAMILIES,
+    Codec,
+    CodecMeasurement,
+    CompressionChoice,
+    DEFAULT_SAMPLE_SIZE,
+    PrefixedReader,
+    choose_codec,
+    read_sample,
+)
+from .ring import (
+    BufferStage,
+    BufferStats,
+    DEFAULT_BUFFER_SIZE,
+    RingBuffer,
+    set_pipe_size,
+)
+from .sinks import (
+    DigestSink,
+    FileSink,
+    ProcessSink,
+    Sink,
+)
+from .tee import (
+    Tee,
+    TeeResult,
+)
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from typing import Protocol
+
+
+class Reader(Protocol):
+    "source of a stream, e.g. the stdout pipe of a process or a file"
+
+    def read(self, size: int = -1, /) -> bytes:
+        ...
+
+
+class ChunkReader(Reader, Protocol):
+    "source which fills a buffer with what is available in a single read, like io.BufferedReader"
+
+    def readinto1(self, buffer: memoryview, /) -> int:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+__all__ = [
+    "ChunkReader",
+    "Reader",
+]
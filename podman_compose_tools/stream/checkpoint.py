@@ -0,0 +1,333 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import BinaryIO, List, Optional
+
+from attrs import define, field
+
+from .base import Reader
+from .sinks import Sink
+
+
+DEFAULT_CHECKPOINT_SIZE = 16 * 1024 * 1024
+DEFAULT_CHECKPOINT_ALGORITHM = "sha256"
+JOURNAL_SUFFIX = ".journal"
+
+
+def journal_path_for(path: Path) -> Path:
+    return path.with_name(path.name + JOURNAL_SUFFIX)
+
+
+@define(frozen=True)
+class ChunkRecord:
+    offset: int
+    size: int
+    digest: str
+
+
+@define(kw_only=True)
+class ChunkJournal:
+    """
+    Checksums of fixed-size chunks of a file, stored as JSON lines next to it.
+    The journal only lists chunks already synced to disk,
+    so a file can be trusted up to the end of its last verified chunk.
+    """
+
+    chunk_size: int
+    algorithm: str
+    chunks: List[ChunkRecord] = field(factory=list)
+    complete: bool = False
+
+    @property
+    def size(self) -> int:
+        if not self.chunks:
+            return 0
+        last = self.chunks[-1]
+        return last.offset + last.size
+
+    @classmethod
+    def read(cls, path: Path) -> Optional[ChunkJournal]:
+        "reads the journal of path, ignoring a torn last line"
+        try:
+            with open(journal_path_for(path), "r") as fh:
+                lines = fh.read().splitlines()
+        except FileNotFoundError:
+            return None
+        journal: Optional[ChunkJournal] = None
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            if journal is None:
+                journal = cls(
+                    chunk_size=entry["chunk_size"],
+                    algorithm=entry["algorithm"],
+                )
+            elif entry.get("complete"):
+                journal.complete = True
+            else:
+                journal.chunks.append(ChunkRecord(**entry))
+        return journal
+
+    def write(self, path: Path) -> None:
+        "rewrites the whole journal of path"
+        with open(journal_path_for(path), "w") as fh:
+            fh.write(self._header_line())
+            for chunk in self.chunks:
+                fh.write(self._chunk_line(chunk))
+            if self.complete:
+                fh.write(self._footer_line())
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def _header_line(self) -> str:
+        return (
+            json.dumps({"chunk_size": self.chunk_size, "algorithm": self.algorithm})
+            + "\n"
+        )
+
+    @staticmethod
+    def _chunk_line(chunk: ChunkRecord) -> str:
+        return (
+            json.dumps(
+                {"offset": chunk.offset, "size": chunk.size, "digest": chunk.digest}
+            )
+            + "\n"
+        )
+
+    @staticmethod
+    def _footer_line() -> str:
+        return json.dumps({"complete": True}) + "\n"
+
+    def verified_chunks(self, path: Path) -> List[ChunkRecord]:
+        "returns the leading chunks whose content in path still matches"
+        verified = list[ChunkRecord]()
+        try:
+            fh = open(path, "rb")
+        except FileNotFoundError:
+            return verified
+        with fh:
+            for chunk in self.chunks:
+                data = fh.read(chunk.size)
+                if len(data) != chunk.size:
+                    break
+                if hashlib.new(self.algorithm, data).hexdigest() != chunk.digest:
+                    break
+                verified.append(chunk)
+        return verified
+
+
+def prepare_resume(
+    path: Path,
+    *,
+    chunk_size: int = DEFAULT_CHECKPOINT_SIZE,
+    algorithm: str = DEFAULT_CHECKPOINT_ALGORITHM,
+) -> int:
+    """
+    Cuts path & its journal back to the last verified full chunk,
+    returns the offset to continue writing from.
+    """
+    journal = ChunkJournal.read(path)
+    if (
+        not path.exists()
+        or journal is None
+        or journal.chunk_size != chunk_size
+        or journal.algorithm != algorithm
+    ):
+        return 0
+    verified = [
+        chunk for chunk in journal.verified_chunks(path) if chunk.size == chunk_size
+    ]
+    journal.chunks = verified
+    journal.complete = False
+    with open(path, "r+b") as fh:
+        fh.truncate(journal.size)
+    journal.write(path)
+    return journal.size
+
+
+@define
+class CheckpointSink(Sink):
+    """
+    Writes to path while journaling a checksum for every chunk_size bytes.
+    The file is synced before each journal entry, so after a failure
+    prepare_resume can recover everything up to the last entry.
+    Failed streams leave file & journal behind for resuming.
+    """
+
+    path: Path
+    chunk_size: int = field(default=DEFAULT_CHECKPOINT_SIZE, kw_only=True)
+    algorithm: str = field(default=DEFAULT_CHECKPOINT_ALGORITHM, kw_only=True)
+    offset: int = field(default=0, kw_only=True)
+    "continue after offset bytes, see prepare_resume"
+    _journal: ChunkJournal = field(init=False)
+    _fh: Optional[BinaryIO] = field(default=None, init=False)
+    _journal_fh: Optional[BinaryIO] = field(default=None, init=False)
+    _hash: Optional[hashlib._Hash] = field(default=None, init=False)
+    _pending: int = field(default=0, init=False)
+
+    def __attrs_post_init__(self) -> None:
+        if self.offset % self.chunk_size != 0:
+            # TODO specialize
+            raise Exception("Can only resume at chunk boundaries")
+        journal = ChunkJournal.read(self.path) if self.offset else None
+        if journal is None:
+            journal = ChunkJournal(chunk_size=self.chunk_size, algorithm=self.algorithm)
+        journal.chunks = [
+            chunk for chunk in journal.chunks if chunk.offset < self.offset
+        ]
+        if journal.size != self.offset:
+            # TODO specialize
+            raise Exception(
+                f"Journal of {self.path} does not cover offset {self.offset}"
+            )
+        self._journal = journal
+
+    def _open(self) -> BinaryIO:
+        if self._fh is None:
+            self._fh = open(self.path, "r+b" if self.offset else "wb")
+            self._fh.seek(self.offset)
+            self._fh.truncate()
+            self._journal.complete = False
+            self._journal.write(self.path)
+            self._journal_fh = open(journal_path_for(self.path), "ab")
+        return self._fh
+
+    def _checkpoint(self) -> None:
+        assert self._fh is not None and self._journal_fh is not None
+        assert self._hash is not None
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        chunk = ChunkRecord(
+            offset=self._journal.size,
+            size=self._pending,
+            digest=self._hash.hexdigest(),
+        )
+        self._journal.chunks.append(chunk)
+        self._journal_fh.write(ChunkJournal._chunk_line(chunk).encode())
+        self._journal_fh.flush()
+        self._hash = None
+        self._pending = 0
+
+    def write(self, chunk: bytes) -> None:
+        fh = self._open()
+        view = memoryview(chunk)
+        while view:
+            if self._hash is None:
+                self._hash = hashlib.new(self.algorithm)
+            part = view[: self.chunk_size - self._pending]
+            fh.write(part)
+            self._hash.update(part)
+            self._pending += len(part)
+            view = view[len(part) :]
+            if self._pending == self.chunk_size:
+                self._checkpoint()
+
+    def close(self) -> None:
+        self._open()
+        if self._pending:
+            self._checkpoint()
+        assert self._fh is not None and self._journal_fh is not None
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._fh.close()
+        self._journal.complete = True
+        self._journal_fh.write(ChunkJournal._footer_line().encode())
+        self._journal_fh.close()
+
+    def abort(self) -> None:
+        # keep everything already journaled for resuming
+        if self._fh is not None:
+            self._fh.close()
+        if self._journal_fh is not None:
+            self._journal_fh.close()
+
+    @property
+    def journal(self) -> ChunkJournal:
+        return self._journal
+
+
+class VerifyingReader:
+    """
+    Reads a file while checking each chunk against its journal,
+    raises on the first corrupted chunk.
+    """
+
+    def __init__(self, fh: BinaryIO, journal: ChunkJournal, offset: int = 0) -> None:
+        self._fh = fh
+        self._journal = journal
+        self._chunks = [chunk for chunk in journal.chunks if chunk.offset >= offset]
+        self._index = 0
+        if self._chunks and self._chunks[0].offset != offset:
+            # TODO specialize
+            raise Exception("Can only verify from chunk boundaries")
+        self._fh.seek(offset)
+        self._hash = hashlib.new(journal.algorithm)
+        self._pending = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if self._index >= len(self._chunks):
+            if self._fh.read(1):
+                # TODO specialize
+                raise Exception("File is longer than its journal")
+            return b""
+        current = self._chunks[self._index]
+        remaining = current.size - self._pending
+        data = self._fh.read(remaining if size < 0 else min(size, remaining))
+        if not data:
+            # TODO specialize
+            raise Exception(f"File is truncated at offset {current.offset}")
+        self._hash.update(data)
+        self._pending += len(data)
+        if self._pending == current.size:
+            if self._hash.hexdigest() != current.digest:
+                # TODO specialize
+                raise Exception(
+                    f"Checksum mismatch in chunk at offset {current.offset}"
+                )
+            self._index += 1
+            self._hash = hashlib.new(self._journal.algorithm)
+            self._pending = 0
+        return data
+
+
+def skip_verified(stream: Reader, journal: ChunkJournal, offset: int) -> None:
+    """
+    Reads & discards the first offset bytes of stream, e.g. the output of a deterministic command,
+    while checking they match the journaled chunks.
+    The command still produces the whole output, only rewriting it is skipped.
+    """
+    if offset == 0:
+        return
+    for chunk in journal.chunks:
+        if chunk.offset >= offset:
+            break
+        hasher = hashlib.new(journal.algorithm)
+        remaining = chunk.size
+        while remaining:
+            data = stream.read(remaining)
+            if not data:
+                # TODO specialize
+                raise Exception("Source ended before the resume offset")
+            hasher.update(data)
+            remaining -= len(data)
+        if hasher.hexdigest() != chunk.digest:
+            # TODO specialize
+            raise Exception(
+                f"Source differs from the partial output at offset {chunk.offset}, it cannot be resumed"
+            )
+
+
+__all__ = [
+    "CheckpointSink",
+    "ChunkJournal",
+    "ChunkRecord",
+    "VerifyingReader",
+    "journal_path_for",
+    "prepare_resume",
+    "skip_verified",
+]
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+from io import BufferedReader
+import math
+import shlex
+import shutil
+import subprocess
+import threading
+import time
+from typing import IO, List, Optional, Sequence, Tuple
+
+from attrs import define, field
+
+from ..executor import HostExecutor, ShellCommand
+from .base import ChunkReader, Reader
+
+
+DEFAULT_SAMPLE_SIZE = 8 * 1024 * 1024
+# samples are read in chunks of this size to time the producer
+SAMPLE_CHUNK_SIZE = 64 * 1024
+# compressors must be this much faster than the producer to keep up
+DEFAULT_HEADROOM = 1.25
+# compressing must save at least this fraction, otherwise data is stored
+DEFAULT_MIN_SAVING = 0.05
+
+
+@define(frozen=True)
+class Codec:
+    name: str
+    compress_cmd: str
+    decompress_cmd: str
+
+    @property
+    def binary(self) -> str:
+        return shlex.split(self.compress_cmd)[0]
+
+    @property
+    def available(self) -> bool:
+        return shutil.which(self.binary) is not None
+
+
+# each family is ordered from fastest to strongest level
+CODEC_FAMILIES: Sequence[Sequence[Codec]] = [
+    [
+        Codec(f"zstd-{level}", f"zstd -{level} -c -q", "zstd -d -c -q")
+        for level in (1, 3, 9, 19)
+    ],
+    [Codec(f"gzip-{level}", f"gzip -{level} -c", "gzip -d -c") for level in (1, 6, 9)],
+    [Codec(f"xz-{level}", f"xz -{level} -c", "xz -d -c") for level in (0, 6)],
+]
+
+
+@define(frozen=True)
+class CodecMeasurement:
+    codec: Codec
+    ratio: float
+    "compressed size / original size"
+    throughput: float
+    "input bytes per second"
+
+
+@define(kw_only=True)
+class CompressionChoice:
+    codec: Optional[Codec]
+    "None means storing uncompressed"
+    producer_rate: float
+    "bytes per second, infinite if the whole stream fit into the sample"
+    measurements: List[CodecMeasurement] = field(factory=list)
+
+
+def read_sample(stream: Reader, size: int = DEFAULT_SAMPLE_SIZE) -> Tuple[bytes, float]:
+    """
+    Reads up to size bytes from stream, returns them with the measured producer rate.
+    Timing starts with the first chunk, so the startup of the producer is not included.
+    """
+    parts = list[bytes]()
+    read = 0
+    start = 0.0
+    while read < size:
+        chunk = stream.read(min(SAMPLE_CHUNK_SIZE, size - read))
+        if not chunk:
+            # whole stream available, so its speed is irrelevant
+            return b"".join(parts), float("inf")
+        if not parts:
+            start = time.perf_counter()
+        parts.append(chunk)
+        read += len(chunk)
+    elapsed = time.perf_counter() - start
+    # the first chunk arrived when timing started
+    timed = read - len(parts[0])
+    return b"".join(parts), timed / elapsed if elapsed > 0 else float("inf")
+
+
+class _SampleWriter:
+    "feeds sample into stdin of a process, counting the bytes written so far"
+
+    def __init__(self, sample: bytes, stdin: IO[bytes]) -> None:
+        self._sample = memoryview(sample)
+        self._stdin = stdin
+        self.written = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            while self.written < len(self._sample):
+                chunk = self._sample[self.written : self.written + SAMPLE_CHUNK_SIZE]
+                self._stdin.write(chunk)
+                self.written += len(chunk)
+            self._stdin.close()
+        except BrokenPipeError:
+            # reported by the return code of the process
+            pass
+
+    def join(self) -> None:
+        self._thread.join()
+
+
+def measure(codec: Codec, sample: bytes) -> CodecMeasurement:
+    """
+    Compresses sample the same way as the actual compressor is spawned.
+    Timing starts with the first output chunk, so the startup of the compressor is not included,
+    only counting the input written after it. Compressors which only output at the end
+    (e.g. as sample fits into their window) are timed from their start instead.
+    """
+    start = time.perf_counter()
+    process = ShellCommand.from_str(command=codec.compress_cmd).spawn(
+        executor=HostExecutor(),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+    )
+    assert process.stdin is not None
+    # subprocess opens pipes buffered
+    stdout = process.stdout
+    assert isinstance(stdout, BufferedReader)
+    writer = _SampleWriter(sample, process.stdin)
+    output = 0
+    first_output: Optional[float] = None
+    written_before = 0
+    try:
+        while chunk := stdout.read1(SAMPLE_CHUNK_SIZE):
+            if first_output is None:
+                first_output = time.perf_counter()
+                written_before = writer.written
+            output += len(chunk)
+    except:
+        process.kill()
+        raise
+    finally:
+        stdout.close()
+        writer.join()
+    end = time.perf_counter()
+    returncode = process.wait()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode=returncode, cmd=process.args)
+    timed = len(sample) - written_before
+    if first_output is None or timed <= 0 or end <= first_output:
+        timed, first_output = len(sample), start
+    elapsed = end - first_output
+    return CodecMeasurement(
+        codec=codec,
+        ratio=output / max(len(sample), 1),
+        throughput=timed / elapsed if elapsed > 0 else float("inf"),
+    )
+
+
+def choose_codec(
+    sample: bytes,
+    producer_rate: float,
+    *,
+    families: Sequence[Sequence[Codec]] = CODEC_FAMILIES,
+    headroom: float = DEFAULT_HEADROOM,
+    min_saving: float = DEFAULT_MIN_SAVING,
+) -> CompressionChoice:
+    """
+    Picks the strongest available codec which still keeps up with producer_rate
+    on sample, or storing if compression does not pay off.
+    An infinite producer_rate (whole stream sampled) imposes no speed limit.
+    """
+    choice = CompressionChoice(codec=None, producer_rate=producer_rate)
+    # nothing is left to wait for, so the best ratio wins
+    required = producer_rate * headroom if math.isfinite(producer_rate) else 0.0
+    for family in families:
+        for codec in family:
+            if not codec.available:
+                break
+            measurement = measure(codec, sample)
+            choice.measurements.append(measurement)
+            if measurement.ratio > 1 - min_saving:
+                # incompressible data will not get better with other codecs
+                return choice
+            if measurement.throughput < required:
+                # stronger levels are even slower
+                break
+    fitting = [
+        measurement
+        for measurement in choice.measurements
+        if measurement.throughput >= required and measurement.ratio <= 1 - min_saving
+    ]
+    if fitting:
+        best = min(fitting, key=lambda measurement: measurement.ratio)
+        choice.codec = best.codec
+    return choice
+
+
+class PrefixedReader:
+    "reads prefix first, then continues with stream"
+
+    def __init__(self, prefix: bytes, stream: ChunkReader) -> None:
+        self._prefix = memoryview(prefix)
+        self._stream = stream
+
+    def read(self, size: int = -1, /) -> bytes:
+        if self._prefix:
+            count = len(self._prefix) if size < 0 else min(size, len(self._prefix))
+            data = bytes(self._prefix[:count])
+            self._prefix = self._prefix[count:]
+            return data
+        return self._stream.read(size)
+
+    def readinto1(self, buffer: memoryview, /) -> int:
+        if self._prefix:
+            count = min(len(buffer), len(self._prefix))
+            buffer[:count] = self._prefix[:count]
+            self._prefix = self._prefix[count:]
+            return count
+        return self._stream.readinto1(buffer)
+
+    def close(self) -> None:
+        self._stream.close()
+
+
+__all__ = [
+    "CODEC_FAMILIES",
+    "Codec",
+    "CodecMeasurement",
+    "CompressionChoice",
+    "DEFAULT_SAMPLE_SIZE",
+    "PrefixedReader",
+    "choose_codec",
+    "measure",
+    "read_sample",
+]
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import fcntl
+import threading
+import time
+from typing import IO, Optional
+
+from attrs import define, field
+
+from .base import ChunkReader
+
+
+DEFAULT_BUFFER_SIZE = 256 * 1024 * 1024
+# upper limit for a single read / write, so progress is visible to the other side early
+CHUNK_SIZE = 1024 * 1024
+
+
+@define(kw_only=True)
+class BufferStats:
+    capacity: int
+    size: int = field(default=0)
+    "bytes passed through the buffer"
+    max_fill: int = field(default=0)
+    mean_fill: float = field(default=0)
+    "time weighted mean of the fill level in bytes"
+    full_wait: float = field(default=0)
+    "seconds the producer waited for free space, i.e. the consumer was too slow"
+    empty_wait: float = field(default=0)
+    "seconds the consumer waited for data, i.e. the producer was too slow"
+    duration: float = field(default=0)
+
+    def describe(self) -> str:
+        return (
+            f"{self.size} bytes in {self.duration:.1f}s,"
+            f" fill max {self.max_fill / self.capacity:.0%} mean {self.mean_fill / self.capacity:.0%},"
+            f" producer blocked {self.full_wait:.1f}s, consumer starved {self.empty_wait:.1f}s"
+        )
+
+
+class RingBuffer:
+    """
+    Preallocated byte ring for one writer & one reader thread.
+    Both sides work on views into the ring, so data is copied only once on each side.
+    """
+
+    capacity: int
+
+    def __init__(self, capacity: int = DEFAULT_BUFFER_SIZE) -> None:
+        if capacity <= 0:
+            # TODO specialize
+            raise Exception(f"Buffer capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self.__view = memoryview(bytearray(capacity))
+        # total bytes written / read, positions in the ring are modulo capacity
+        self.__written = 0
+        self.__read = 0
+        self.__closed = False
+        self.__aborted = False
+        self.__cond = threading.Condition()
+        self.__started = time.monotonic()
+        self.__changed = self.__started
+        self.__fill_integral = 0.0
+        self.__max_fill = 0
+        self.__full_wait = 0.0
+        self.__empty_wait = 0.0
+
+    @property
+    def fill(self) -> int:
+        "bytes currently buffered"
+        return self.__written - self.__read
+
+    def __account(self) -> None:
+        "must be called before each fill change while holding the lock"
+        now = time.monotonic()
+        self.__fill_integral += self.fill * (now - self.__changed)
+        self.__changed = now
+
+    def writable(self, limit: int = CHUNK_SIZE) -> Optional[memoryview]:
+        "blocks until space is free, returns None if the reader aborted"
+        with self.__cond:
+            if self.fill == self.capacity and not self.__aborted:
+                start = time.monotonic()
+                self.__cond.wait_for(
+                    lambda: self.fill < self.capacity or self.__aborted
+                )
+                self.__full_wait += time.monotonic() - start
+            if self.__aborted:
+                return None
+            offset = self.__written % self.capacity
+            free = self.capacity - self.fill
+            return self.__view[
+                offset : offset + min(free, self.capacity - offset, limit)
+            ]
+
+    def commit(self, count: int) -> None:
+        "marks count bytes of the last writable view as written"
+        with self.__cond:
+            self.__account()
+            self.__written += count
+            self.__max_fill = max(self.__max_fill, self.fill)
+            self.__cond.notify_all()
+
+    def readable(self, limit: int = CHUNK_SIZE) -> memoryview:
+        "blocks until data is available, returns an empty view at the end of data"
+        with self.__cond:
+            if self.fill == 0 and not self.__closed:
+                start = time.monotonic()
+                self.__cond.wait_for(lambda: self.fill > 0 or self.__closed)
+                self.__empty_wait += time.monotonic() - start
+            offset = self.__read % self.capacity
+            return self.__view[
+                offset : offset + min(self.fill, self.capacity - offset, limit)
+            ]
+
+    def release(self, count: int) -> None:
+        "marks count bytes of the last readable view as consumed"
+        with self.__cond:
+            self.__account()
+            self.__read += count
+            self.__cond.notify_all()
+
+    def close(self) -> None:
+        "called by the writer after the last commit"
+        with self.__cond:
+            self.__closed = True
+            self.__cond.notify_all()
+
+    def abort(self) -> None:
+        "called by the reader if it cannot consume any more"
+        with self.__cond:
+            self.__aborted = True
+            self.__cond.notify_all()
+
+    def stats(self) -> BufferStats:
+        with self.__cond:
+            self.__account()
+            duration = self.__changed - self.__started
+            return BufferStats(
+                capacity=self.capacity,
+                size=self.__read,
+                max_fill=self.__max_fill,
+                mean_fill=self.__fill_integral / duration if duration > 0 else 0,
+                full_wait=self.__full_wait,
+                empty_wait=self.__empty_wait,
+                duration=duration,
+            )
+
+
+def set_pipe_size(stream: IO[bytes], size: int) -> Optional[int]:
+    """
+    Resizes the kernel buffer of a pipe (Linux only),
+    returns the resulting size or None if not supported / permitted.
+    """
+    set_size = getattr(fcntl, "F_SETPIPE_SZ", None)
+    if set_size is None:
+        return None
+    try:
+        return fcntl.fcntl(stream.fileno(), set_size, size)
+    except OSError:
+        # e.g. above /proc/sys/fs/pipe-max-size without CAP_SYS_RESOURCE
+        return None
+
+
+class BufferStage:
+    """
+    Decouples a producer from a consumer by copying source into target
+    through a RingBuffer, filled & drained by separate threads,
+    so bursts on either side are absorbed instead of stalling the other.
+    Closes source & target when done.
+    """
+
+    buffer: RingBuffer
+    error: Optional[BaseException]
+
+    def __init__(
+        self,
+        source: ChunkReader,
+        target: IO[bytes],
+        *,
+        capacity: int = DEFAULT_BUFFER_SIZE,
+        name: str = "buffer",
+    ) -> None:
+        self.buffer = RingBuffer(capacity)
+        self.error = None
+        self.__source = source
+        self.__target = target
+        self.__threads = [
+            threading.Thread(target=self.__fill, name=f"{name} fill", daemon=True),
+            threading.Thread(target=self.__drain, name=f"{name} drain", daemon=True),
+        ]
+
+    def __fill(self) -> None:
+        try:
+            while (view := self.buffer.writable()) is not None:
+                # returns what is available instead of waiting for a full view
+                count = self.__source.readinto1(view)
+                if not count:
+                    break
+                self.buffer.commit(count)
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.buffer.close()
+            self.__source.close()
+
+    def __drain(self) -> None:
+        try:
+            while view := self.buffer.readable():
+                self.__target.write(view)
+                self.buffer.release(len(view))
+            self.__target.flush()
+        except BrokenPipeError:
+            # consumer died, its exit code is reported instead
+            self.buffer.abort()
+        except BaseException as e:
+            self.error = e
+            self.buffer.abort()
+        finally:
+            try:
+                self.__target.close()
+            except BrokenPipeError:
+                pass
+
+    def start(self) -> BufferStage:
+        for thread in self.__threads:
+            thread.start()
+        return self
+
+    def join(self) -> BufferStats:
+        "waits for both threads, raises what failed in them"
+        for thread in self.__threads:
+            thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.buffer.stats()
+
+
+__all__ = [
+    "BufferStage",
+    "BufferStats",
+    "DEFAULT_BUFFER_SIZE",
+    "RingBuffer",
+    "set_pipe_size",
+]
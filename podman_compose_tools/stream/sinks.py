@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import abc
+import hashlib
+from pathlib import Path, PurePath
+import subprocess
+from typing import BinaryIO, Optional
+
+from attrs import define, field
+
+from ..executor import Command, ExecutorTarget
+
+
+class Sink(metaclass=abc.ABCMeta):
+    @abc.abstractmethod
+    def write(self, chunk: bytes) -> None:
+        ...
+
+    @abc.abstractmethod
+    def close(self) -> None:
+        "flushes all data, raises if the sink did not succeed"
+        ...
+
+    def abort(self) -> None:
+        "called instead of close if the stream failed"
+        self.close()
+
+
+@define
+class FileSink(Sink):
+    path: Path
+    _fh: Optional[BinaryIO] = field(default=None, init=False)
+
+    def write(self, chunk: bytes) -> None:
+        if self._fh is None:
+            self._fh = open(self.path, "wb")
+        self._fh.write(chunk)
+
+    def close(self) -> None:
+        if self._fh is None:
+            # create empty file for empty streams
+            self._fh = open(self.path, "wb")
+        self._fh.close()
+
+    def abort(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+        # do not leave truncated files behind
+        self.path.unlink(missing_ok=True)
+
+
+@define
+class ProcessSink(Sink):
+    "writes to stdin of an already running process"
+
+    process: subprocess.Popen
+
+    @classmethod
+    def spawn(
+        cls,
+        command: Command,
+        executor: ExecutorTarget,
+        work_dir: Optional[PurePath] = None,
+    ) -> ProcessSink:
+        return cls(
+            process=command.spawn(
+                executor=executor,
+                stdin=subprocess.PIPE,
+                work_dir=work_dir,
+            )
+        )
+
+    def _check_returncode(self) -> None:
+        returncode = self.process.wait()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(
+                returncode=returncode,
+                cmd=self.process.args,
+            )
+
+    def write(self, chunk: bytes) -> None:
+        assert self.process.stdin is not None
+        try:
+            self.process.stdin.write(chunk)
+        except BrokenPipeError:
+            # prefer reporting why the process exited early
+            self._check_returncode()
+            raise
+
+    def close(self) -> None:
+        assert self.process.stdin is not None
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        self._check_returncode()
+
+    def abort(self) -> None:
+        self.process.kill()
+        self.process.wait()
+
+
+@define
+class DigestSink(Sink):
+    "computes a checksum of the stream, e.g. sha256 or blake2b"
+
+    algorithm: str
+    _hash: hashlib._Hash = field(init=False)
+
+    def __attrs_post_init__(self) -> None:
+        self._hash = hashlib.new(self.algorithm)
+
+    @property
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    def feed_file(self, path: Path, size: int) -> None:
+        "hashes the first size bytes of path, e.g. when resuming a stream"
+        with open(path, "rb") as fh:
+            while size > 0 and (chunk := fh.read(min(size, 1024 * 1024))):
+                self._hash.update(chunk)
+                size -= len(chunk)
+
+    def write(self, chunk: bytes) -> None:
+        self._hash.update(chunk)
+
+    def close(self) -> None:
+        pass
+
+
+__all__ = ["DigestSink", "FileSink", "ProcessSink", "Sink"]
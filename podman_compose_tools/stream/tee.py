@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import queue
+import threading
+from typing import Dict, List, Optional, Sequence
+
+from attrs import define, field
+
+from .base import Reader
+from .sinks import DigestSink, Sink
+
+
+CHUNK_SIZE = 1024 * 1024
+# chunks buffered per sink, limits memory usage to about
+# CHUNK_SIZE * (QUEUE_DEPTH + 1) as chunks are shared between sinks
+QUEUE_DEPTH = 8
+
+
+_EOF = None
+
+
+@define
+class TeeResult:
+    size: int
+    digests: Dict[str, str]
+
+
+@define
+class _SinkWorker:
+    sink: Sink
+    queue: queue.Queue[Optional[bytes]]
+    error: Optional[BaseException] = field(default=None)
+    thread: Optional[threading.Thread] = field(default=None)
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        while (chunk := self.queue.get()) is not _EOF:
+            if self.error is not None:
+                # keep draining so the producer is never blocked by a failed sink
+                continue
+            try:
+                self.sink.write(chunk)
+            except BaseException as e:
+                self.error = e
+        try:
+            if self.error is None:
+                self.sink.close()
+            else:
+                self.sink.abort()
+        except BaseException as e:
+            if self.error is None:
+                self.error = e
+
+    def join(self) -> None:
+        assert self.thread is not None
+        self.thread.join()
+
+
+@define
+class Tee:
+    """
+    Fans one producer stream out to multiple sinks, each written by its own thread.
+    Queues between producer & sinks are bounded,
+    so the slowest sink limits the rate instead of buffering without limit.
+    """
+
+    sinks: Sequence[Sink]
+    chunk_size: int = field(default=CHUNK_SIZE, kw_only=True)
+    queue_depth: int = field(default=QUEUE_DEPTH, kw_only=True)
+
+    def run(self, source: Reader) -> TeeResult:
+        workers = [
+            _SinkWorker(sink=sink, queue=queue.Queue(maxsize=self.queue_depth))
+            for sink in self.sinks
+        ]
+        for worker in workers:
+            worker.start()
+        size = 0
+        try:
+            while chunk := source.read(self.chunk_size):
+                if any(worker.error is not None for worker in workers):
+                    break
+                size += len(chunk)
+                for worker in workers:
+                    worker.queue.put(chunk)
+        except BaseException as e:
+            for worker in workers:
+                worker.error = worker.error or e
+            raise
+        finally:
+            for worker in workers:
+                worker.queue.put(_EOF)
+            for worker in workers:
+                worker.join()
+        errors: List[BaseException] = [
+            worker.error for worker in workers if worker.error is not None
+        ]
+        if errors:
+            # discard the incomplete output of all other sinks as well
+            for worker in workers:
+                if worker.error is None:
+                    try:
+                        worker.sink.abort()
+                    except Exception:
+                        pass
+            raise errors[0]
+        return TeeResult(
+            size=size,
+            digests={
+                sink.algorithm: sink.hexdigest
+                for sink in self.sinks
+                if isinstance(sink, DigestSink)
+            },
+        )
+
+
+__all__ = ["Tee", "TeeResult"]